@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+"""
+Benchmark of conversions between all pairs of formats in ManagerFca.READ_DATA.
+Synthetic source files are generated from one CSV file with integer values, every pair
+is converted by Convertor.read_info and Convertor.convert in a new interpreter process.
+Prints time of both phases, rows/sec and peak RSS of the process, results can be stored
+to a JSON file and compared with results stored before (e.g. on another commit).
+
+usage: bench_convert.py [-h] [-r ROWS] [-a ATTRS] [-s SPARSITY] [-f {simple,complex}]
+                        [-p PAIRS] [-n REPEAT] [-d DIR] [-o OUTPUT] [-c COMPARE]
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+from swift_fca.swift_core.managers_fca import ManagerFca, Convertor  # NOQA
+from swift_fca.swift_core.constants_fca import RunParams  # NOQA
+from swift_fca.swift_core.validator_fca import ConvertValidator  # NOQA
+
+# formats with binary attributes only
+BINARY = (ManagerFca.DAT, ManagerFca.CXT, ManagerFca.DTL)
+# formats which need classes
+WITH_CLASSES = (ManagerFca.DATA, ManagerFca.DTL)
+# argument of the process which runs one conversion (see run_pair)
+RUN_PAIR = '--run-pair'
+# scale formulas of one attribute, value is zero with probability equal to sparsity
+FORMULAS = {'simple': "{0}:n[x>0]",
+            'complex': "b{0}={0}:n[0<x<=100]"}
+
+
+def get_formula(attrs, complexity):
+    return "; ".join(FORMULAS[complexity].format(i) for i in range(attrs))
+
+
+def get_source_args(source_ext, target_ext, attrs, complexity):
+    """Return arguments of the source data required by the conversion"""
+    args = {}
+    if target_ext in WITH_CLASSES:
+        args[RunParams.CLASSES] = str(attrs - 1)
+    if RunParams.SOURCE_ATTRS in ConvertValidator.PARAMS_FILTER.get(source_ext + target_ext, [[]])[0]:
+        if source_ext in BINARY:
+            args[RunParams.SOURCE_ATTRS] = "0-{}".format(attrs - 1)
+        else:
+            args[RunParams.SOURCE_ATTRS] = get_formula(attrs, complexity)
+    return args
+
+
+def generate_csv(path, rows, attrs, sparsity, seed=0):
+    rand = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write(",".join("a{}".format(i) for i in range(attrs)) + "\n")
+        for _ in range(rows):
+            f.write(",".join("0" if rand.random() < sparsity else str(rand.randint(1, 100))
+                             for _ in range(attrs)) + "\n")
+
+
+def generate_sources(directory, rows, attrs, sparsity, complexity):
+    """Generate source file of every format, return dictionary extension -> path"""
+    csv_path = os.path.join(directory, "source" + ManagerFca.CSV)
+    generate_csv(csv_path, rows, attrs, sparsity)
+    sources = {ManagerFca.CSV: csv_path}
+    numeric = "; ".join("a{0}={0}:n".format(i) for i in range(attrs))
+    scale = get_formula(attrs, 'simple')
+    for ext, formula in ((ManagerFca.ARFF, numeric), (ManagerFca.DATA, numeric),
+                         (ManagerFca.DAT, scale), (ManagerFca.CXT, scale), (ManagerFca.DTL, scale)):
+        path = os.path.join(directory, "source" + ext)
+        source_args = {RunParams.SOURCE_ATTRS: formula}
+        if ext in WITH_CLASSES:
+            source_args[RunParams.CLASSES] = str(attrs - 1)
+        convert(csv_path, path, source_args)
+        sources[ext] = path
+    return sources
+
+
+def convert(source_path, target_path, source_args):
+    """Convert the file, return times of read_info and convert"""
+    source_args = dict(source_args)
+    with open(source_path, 'r') as source, open(target_path, 'w') as target:
+        source_args[RunParams.SOURCE] = source
+        convertor = Convertor(source_args, {RunParams.TARGET: target})
+        start = time.perf_counter()
+        convertor.read_info()
+        read_time = time.perf_counter() - start
+        start = time.perf_counter()
+        convertor.convert()
+        return read_time, time.perf_counter() - start
+
+
+def get_peak_rss():
+    """Return peak resident set size of this process in MB, or None"""
+    # VmHWM is reset by exec, ru_maxrss on Linux keeps the peak of the parent process
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_pair(source_path, target_path, source_args):
+    """
+    Run the conversion in a new interpreter process (see RUN_PAIR), so peak RSS belongs
+    to the conversion only. Return times of read_info, convert and peak RSS.
+    """
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), RUN_PAIR,
+                                      json.dumps([source_path, target_path, source_args])])
+    return tuple(json.loads(output.decode().splitlines()[-1]))
+
+
+def run_pair_main(pair_args):
+    """Entry point of the process started by run_pair, result is printed to stdout as JSON"""
+    source_path, target_path, source_args = json.loads(pair_args)
+    read_time, convert_time = convert(source_path, target_path, source_args)
+    print(json.dumps([read_time, convert_time, get_peak_rss()]))
+
+
+def get_pairs(selected):
+    pairs = [(s, t) for s in ManagerFca.EXTENSIONS for t in ManagerFca.EXTENSIONS
+             if s + t in ManagerFca.READ_DATA]
+    if selected:
+        names = set(selected.split(','))
+        pairs = [(s, t) for s, t in pairs if pair_name(s, t) in names]
+    return pairs
+
+
+def pair_name(source_ext, target_ext):
+    return "{}-{}".format(source_ext[1:], target_ext[1:])
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(args, directory):
+    sources = generate_sources(directory, args.rows, args.attrs, args.sparsity, args.formula)
+    results = []
+    for source_ext, target_ext in get_pairs(args.pairs):
+        target_path = os.path.join(directory, "target" + target_ext)
+        source_args = get_source_args(source_ext, target_ext, args.attrs, args.formula)
+        best = None
+        for _ in range(args.repeat):
+            times = run_pair(sources[source_ext], target_path, source_args)
+            if best is None or sum(times[:2]) < sum(best[:2]):
+                best = times
+        read_time, convert_time, peak_rss = best
+        total = read_time + convert_time
+        results.append({'pair': pair_name(source_ext, target_ext),
+                        'read_info': round(read_time, 4),
+                        'convert': round(convert_time, 4),
+                        'total': round(total, 4),
+                        'rows_per_sec': round(args.rows / total),
+                        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None})
+        print_result(results[-1])
+    return results
+
+
+def print_result(result, previous=None):
+    text = "{pair:10} read_info: {read_info:8.3f}s  convert: {convert:8.3f}s  {rows_per_sec:10} rows/s".format(**result)
+    if result['peak_rss_mb'] is not None:
+        text += "  peak RSS: {:7.1f} MB".format(result['peak_rss_mb'])
+    if previous:
+        text += "  ({:.2f}x)".format(previous['total'] / result['total'])
+    print(text)
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = {r['pair']: r for r in json.load(f)['results']}
+    print("\nCompared with {}:".format(path))
+    for result in results:
+        if result['pair'] in previous:
+            print_result(result, previous[result['pair']])
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == RUN_PAIR:
+        run_pair_main(sys.argv[2])
+        return
+    parser = argparse.ArgumentParser(description="Benchmark of conversions between all pairs of formats.")
+    parser.add_argument("-r", "--rows", type=int, default=20000, help="Count of generated rows.")
+    parser.add_argument("-a", "--attrs", type=int, default=20, help="Count of generated attributes.")
+    parser.add_argument("-s", "--sparsity", type=float, default=0.7, help="Probability of zero (false) value.")
+    parser.add_argument("-f", "--formula", choices=sorted(FORMULAS), default='simple',
+                        help="Complexity of scale formulas used in conversions to binary formats.")
+    parser.add_argument("-p", "--pairs", help="Benchmarked pairs separated by commas, e.g. 'csv-arff,dat-cxt'.")
+    parser.add_argument("-n", "--repeat", type=int, default=1, help="Every pair is run n times, the best time is used.")
+    parser.add_argument("-d", "--directory", help="Directory for generated files, default is a temporary directory.")
+    parser.add_argument("-o", "--output", help="Store results to the JSON file.")
+    parser.add_argument("-c", "--compare", help="Compare results with results stored in the JSON file.")
+    args = parser.parse_args()
+
+    if args.directory:
+        os.makedirs(args.directory, exist_ok=True)
+        results = benchmark(args, args.directory)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = benchmark(args, directory)
+
+    if args.compare:
+        compare(results, args.compare)
+    if args.output:
+        report = {'commit': get_commit(),
+                  'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'python': platform.python_version(),
+                  'params': {'rows': args.rows, 'attrs': args.attrs,
+                             'sparsity': args.sparsity, 'formula': args.formula},
+                  'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""
+Micro-benchmark of Data.ss_str, which splits every line in prepare_line.
+Prints rows/sec of the former implementation (re.split with map) and of the current one.
+
+usage: bench_ss_str.py [rows] [columns]
+"""
+from __future__ import print_function
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from swift_fca.swift_core.data_fca import DataCsv  # NOQA
+
+
+def former_ss_str(string, separator, max_split=0):
+    result = list(map(lambda x: x.strip(),
+                      re.split(r'(?<!\\)' + separator, string, max_split)))
+    if len(result) == 1 and not result[0]:
+        return []
+    return result
+
+
+def measure(func, lines, separator):
+    start = time.perf_counter()
+    for line in lines:
+        func(line, separator)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    separator = ','
+    line = separator.join("value{} ".format(i) for i in range(columns)) + '\n'
+    escaped_line = line.replace("value1 ", "val\\,ue1 ")
+    data = DataCsv(io.StringIO(), separator=separator)
+
+    for name, lines in (("plain", [line] * rows), ("escaped", [escaped_line] * rows)):
+        before = measure(former_ss_str, lines, separator)
+        after = measure(data.ss_str, lines, separator)
+        print("{:8} before: {:12.0f} rows/s  after: {:12.0f} rows/s  ({:.2f}x)".format(
+            name, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""
+Benchmark of value tracking in AttrEnum.update and Class.update_values, which are called for every row
+in get_data_info. Prints rows/sec of the former implementation (values in list) and of the current one.
+
+usage: bench_values.py [rows] [distinct]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from swift_fca.swift_core.attributes_fca import Attribute, AttrEnum  # NOQA
+from swift_fca.swift_core.data_fca import Class  # NOQA
+
+
+class FormerAttrEnum(AttrEnum):
+    def __init__(self, index, name):
+        super().__init__(index, name)
+        self._values = []
+
+    def update(self, value, none_val, step=1):
+        if value not in self._values and value != none_val:
+            self._values.append(value)
+        Attribute.update(self, value, none_val, step)
+        return self
+
+
+class FormerClass(Class):
+    def __init__(self, key):
+        super().__init__(key)
+        self._values = []
+
+    def update_values(self, val):
+        val = str(val)
+        if val not in self._values:
+            self._values.append(val)
+
+
+def measure(func, values, timeout):
+    """Return rows/sec and processed rows count, measuring is stopped after timeout seconds"""
+    start = time.perf_counter()
+    count = 0
+    for count, value in enumerate(values, 1):
+        func(value)
+        if not count % 1000 and time.perf_counter() - start > timeout:
+            break
+    return count / (time.perf_counter() - start), count
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    # the former implementation is quadratic, it is measured only for limited time
+    timeout = 30
+    values = ["id{}".format(i % distinct) for i in range(rows)]
+
+    former_attr, current_attr = FormerAttrEnum(0, "a"), AttrEnum(0, "a")
+    benchmarks = (("AttrEnum", lambda v: former_attr.update(v, None), lambda v: current_attr.update(v, None)),
+                  ("Class", FormerClass("c").update_values, Class("c").update_values))
+    for name, former_func, current_func in benchmarks:
+        before, before_rows = measure(former_func, values, timeout)
+        after, after_rows = measure(current_func, values, timeout)
+        print("{:8} before: {:12.0f} rows/s ({} rows)  after: {:12.0f} rows/s ({} rows)  ({:.1f}x)".format(
+            name, before, before_rows, after, after_rows, after / before))
+
+
+if __name__ == '__main__':
+    main()
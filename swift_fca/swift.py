@@ -1,14 +1,17 @@
 import sys
+import bisect
 import collections
 import os.path
 import traceback
 import itertools
 from PyQt4 import QtGui, QtCore
 from PyQt4.QtCore import SIGNAL
-from .swift_core.managers_fca import Browser, Convertor, Printer, ManagerFca
+from .swift_core.managers_fca import PrefetchBrowser, Convertor, Printer, ManagerFca
 from .swift_core.constants_fca import RunParams, FileType, ShortCuts, App
 from .swift_core.validator_fca import ConvertValidator
+from .swift_core.data_fca import DataArff
 from .swift_core.errors_fca import ErrorMessage, SwiftError
+from .swift_core.source_fca import open_file, split_compression
 import swift_fca.resources.resources_rc  # NOQA Resources file
 
 
@@ -369,12 +372,12 @@ class GuiSwift(QtGui.QWidget):
     def browse_next_source(self, value):
         """Slot for table_view_source ValueChanged"""
         if self.table_view_source.verticalScrollBar().maximum() == value and self.browser_source:
-            self.browse_data(self.browser_source, self.table_view_source)
+            self.browse_data(self.browser_source, self.table_view_source, ready_only=True)
 
     def browse_next_target(self, value):
         """Slot for table_view_target ValueChanged"""
         if self.table_view_target.verticalScrollBar().maximum() == value and self.browser_target:
-            self.browse_data(self.browser_target, self.table_view_target)
+            self.browse_data(self.browser_target, self.table_view_target, ready_only=True)
 
     def export_info(self):
         file_name = QtGui.QFileDialog.getSaveFileName(self, "Select file to export info about data")
@@ -402,7 +405,7 @@ class GuiSwift(QtGui.QWidget):
 
             try:
                 main_args = self.source_params
-                main_args[RunParams.SOURCE] = open(self.subst_ext(self.source), 'r')
+                main_args[RunParams.SOURCE] = open_file(self.subst_ext(self.source), 'r')
                 printer = Printer(main_args, **self.source_params)
                 printer.gui = True
             except:
@@ -441,9 +444,9 @@ class GuiSwift(QtGui.QWidget):
         if procces:
             # preparing params
             s_p = self.source_params
-            s_p[RunParams.SOURCE] = open(self.subst_ext(self.source), 'r')
+            s_p[RunParams.SOURCE] = open_file(self.subst_ext(self.source), 'r')
             t_p = self.target_params
-            t_p[RunParams.TARGET] = open(self.subst_ext(self.target), 'w')
+            t_p[RunParams.TARGET] = open_file(self.subst_ext(self.target), 'w')
 
             # conversion
 
@@ -546,10 +549,8 @@ class GuiSwift(QtGui.QWidget):
     def set_line_bg(self, line, color):
         line.setStyleSheet('QLineEdit { background-color: %s }' % color)
 
-    def browse_data(self, browser, table_view):
-        data = browser.get_display_data(self.scroll_count())
-        table_view.model().table.extend(data)
-        table_view.model().layoutChanged.emit()
+    def browse_data(self, browser, table_view, ready_only=False):
+        table_view.model().fetch_next(self.scroll_count(), ready_only)
         if browser.errors:
             self.show_dialog(ErrorMessage.SKIPPED_ERRORS_HEADER, ErrorMessage.SKIPPED_ERRORS, browser.errors, QtGui.QMessageBox.Information)
 
@@ -568,6 +569,7 @@ class GuiSwift(QtGui.QWidget):
             if not browser.stop:
                 header = browser.get_header()
                 table_view.model().header.extend(header)
+                table_view.model().browser = browser
                 self.browse_data(browser, table_view)
 
                 pbar.cancel()
@@ -587,8 +589,8 @@ class GuiSwift(QtGui.QWidget):
 
         try:
             main_args = params
-            main_args[RunParams.SOURCE] = open(self.subst_ext(source_file), 'r')
-            browser = Browser(main_args, **params)
+            main_args[RunParams.SOURCE] = open_file(self.subst_ext(source_file), 'r')
+            browser = PrefetchBrowser(main_args, **params)
             browser.gui = True
         except:
             errors = traceback.format_exc()
@@ -664,27 +666,87 @@ class GuiSwift(QtGui.QWidget):
 
 
 class SwiftTableModel(QtCore.QAbstractTableModel):
+    """
+    Rows are stored in blocks, block contains rows returned by one get_display_data of browser.
+    If browser can seek, only MAX_BLOCKS recently used blocks are kept in memory,
+    other blocks are fetched again by seeking to their first line.
+    """
+
+    # maximal count of blocks kept in memory
+    MAX_BLOCKS = 100
+
     def __init__(self, parent, *args):
         QtCore.QAbstractTableModel.__init__(self, parent, *args)
-        self.table = []
         self.header = []
         self.parent = parent
+        self.browser = None
+        # indexes of first rows of blocks and indexes of their first lines in source
+        self._block_rows = []
+        self._block_lines = []
+        # blocks in memory, keys are indexes of blocks, least recently used block is first
+        self._blocks = collections.OrderedDict()
+        self._row_count = 0
+        self._column_count = 0
+        # index of the line after the last fetched block
+        self._end_line = 0
+
+    def fetch_next(self, count, ready_only=False):
+        """Append next rows from browser, return count of appended rows"""
+        if self.browser.next_line_index != self._end_line:  # browser was moved by get_block
+            self.browser.seek_row(self._end_line)
+        try:
+            rows = self.browser.get_display_data(count, ready_only=ready_only)
+        finally:  # broken line which raised an error is passed too
+            self._end_line = self.browser.next_line_index
+        if rows:
+            self._block_rows.append(self._row_count)
+            self._block_lines.append(self.browser.display_from)
+            self._store_block(len(self._block_rows) - 1, rows)
+            self._row_count += len(rows)
+            self._column_count = len(rows[0])
+            self.layoutChanged.emit()
+        return len(rows)
+
+    def _store_block(self, block_i, rows):
+        self._blocks[block_i] = rows
+        if self.browser.can_seek:
+            while len(self._blocks) > self.MAX_BLOCKS:
+                self._blocks.popitem(last=False)
+
+    def get_block(self, block_i):
+        """Return rows of block, the block is fetched again if it isn't in memory"""
+        try:
+            rows = self._blocks[block_i]
+            self._blocks.move_to_end(block_i)
+            return rows
+        except KeyError:
+            pass
+        end_row = self._block_rows[block_i + 1] if block_i + 1 < len(self._block_rows) else self._row_count
+        self.browser.seek_row(self._block_lines[block_i])
+        rows = self.browser.get_display_data(end_row - self._block_rows[block_i])
+        self._store_block(block_i, rows)
+        return rows
+
+    def iter_rows(self):
+        """Generator of all rows, blocks which aren't in memory are fetched one by one"""
+        for block_i in range(len(self._block_rows)):
+            yield from self.get_block(block_i)
 
     def rowCount(self, parent):
-        return len(self.table)
+        return self._row_count
 
     def columnCount(self, parent):
-        if self.table:
-            return len(self.table[0])
-        return 0
+        return self._column_count
 
     def data(self, index, role):
         if not index.isValid():
             return None
         elif role != QtCore.Qt.DisplayRole:
             return None
+        row = index.row()
+        block_i = bisect.bisect_right(self._block_rows, row) - 1
         try:
-            return self.table[index.row()][index.column()]
+            return self.get_block(block_i)[row - self._block_rows[block_i]][index.column()]
         except IndexError:
             return None
 
@@ -763,7 +825,7 @@ class FindDialog(QtGui.QDialog):
         search_val = self.line.text()
         result = []
         no = 0
-        for row_i, row in enumerate(self.curr_table.model().table):
+        for row_i, row in enumerate(self.curr_table.model().iter_rows()):
             for col_i, col in enumerate(row):
                 if col == search_val:
                     no += 1
@@ -845,7 +907,7 @@ class ParamsDialog(QtGui.QDialog):
             if RunParams.FORMAT in self.params:
                 suff = ".{}".format(self.params[RunParams.FORMAT])
             else:
-                suff = os.path.splitext(path)[1]
+                suff = os.path.splitext(split_compression(path)[0])[1]
             poss_args = self.format_poss_args[suff]
         except (AttributeError, KeyError):
             for name, w in self.widgets.items():
@@ -995,7 +1057,7 @@ class OriginalDataDialog(QtGui.QDialog):
                               self.data_view.document(), **args)
 
         self.source = source_path
-        self.source = open(source_path, 'r')
+        self.source = open_file(source_path, 'r')
         self.data_view.setPlainText(self.load_next(self.load_count))
 
         self.show()
@@ -1250,7 +1312,7 @@ class SourceParamsDialog(ParamsDialog):
 
 
 class TargetParamsDialog(ParamsDialog):
-    format_poss_args = {FileType.ARFF_EXT: (RunParams.FORMAT, RunParams.TARGET_SEP, RunParams.RELATION_NAME),
+    format_poss_args = {FileType.ARFF_EXT: (RunParams.FORMAT, RunParams.TARGET_SEP, RunParams.RELATION_NAME, RunParams.SPARSE),
                         FileType.CSV_EXT: (RunParams.FORMAT, RunParams.TARGET_SEP, RunParams.NFL),
                         FileType.CXT_EXT: (RunParams.FORMAT, RunParams.TARGET_OBJECTS, RunParams.RELATION_NAME),
                         FileType.DAT_EXT: (RunParams.FORMAT),
@@ -1264,11 +1326,14 @@ class TargetParamsDialog(ParamsDialog):
         self.line_str_objects = FormLine("Objects")
         self.line_rel_name = FormLine("Relation Name")
         self.cb_nfl = FormCheckBox('Header Line')
+        self.combo_sparse = FormComboBox("Sparse Data", items=[DataArff.SPARSE_YES, DataArff.SPARSE_AUTO],
+                                         default_val=DataArff.SPARSE_NO)
         # layout
         self.widgets[RunParams.TARGET_SEP] = self.line_separator
         self.widgets[RunParams.TARGET_OBJECTS] = self.line_str_objects
         self.widgets[RunParams.RELATION_NAME] = self.line_rel_name
         self.widgets[RunParams.NFL] = self.cb_nfl
+        self.widgets[RunParams.SPARSE] = self.combo_sparse
         # self.widgets[self.NO_PARAMS] = FormLabel("No arguments can be set.")
 
         self.fill_layout(parent.target)
@@ -1369,6 +1434,7 @@ class PBarDialog(QtGui.QProgressDialog):
         super().__init__(parent)
         self.parent = parent
         self.manager = manager
+        self.label_text = label_text
         self.setLabelText(label_text)
         self.setWindowTitle(title)
         self.setMinimumWidth(450)
@@ -1383,8 +1449,9 @@ class PBarDialog(QtGui.QProgressDialog):
         self.manager.stop = True
         self.cancel()
 
-    def update(self, *args):
-        self.setValue(self.value() + 1)
+    def update(self, percent):
+        self.setValue(percent)
+        self.setLabelText("{}\n{}".format(self.label_text, self.manager.progress))
 
 
 class BgWorker(QtCore.QThread):
@@ -7,6 +7,9 @@ from .swift_core.managers_fca import Convertor, Browser, Printer, ManagerFca
 from .swift_core.constants_fca import RunParams, FileType, App
 from .swift_core.errors_fca import SwiftError, ErrorMessage, ErrorCode, ArgError
 from .swift_core.validator_fca import ConvertValidator
+from .swift_core.data_fca import DataArff
+from .swift_core.cache_fca import InfoCache
+from .swift_core.source_fca import MappedSource, CompressedFile, COMPRESSIONS, split_compression, open_file
 
 SOURCE = 0
 TARGET = 1
@@ -36,6 +39,12 @@ class SwiftFileType(argparse.FileType):
         if ext == FileType.NAMES_EXT:
             string = "{}{}".format(fname, FileType.DATA_EXT)
 
+        # compressed files are decompressed/compressed while they are read/written
+        if split_compression(string)[1]:
+            try:
+                return open_file(string, self._mode, encoding=self._encoding, errors=self._errors)
+            except OSError as e:
+                raise argparse.ArgumentTypeError("can't open '{}': {}".format(string, e))
         return super().__call__(string)
 
 
@@ -68,12 +77,17 @@ def preview(*args):
             pass
 
     browser = Browser(args[SOURCE], **(args[OTHERS]))
-    browser.read_info()
-    header = browser.get_header()
-    formated_header = get_line_format(header).format(*header)
+    try:
+        browser.read_info()
+        if args[OTHERS].get(RunParams.PREVIEW_FROM):
+            browser.seek_row(args[OTHERS][RunParams.PREVIEW_FROM])
+        header = browser.get_header()
+        formated_header = get_line_format(header).format(*header)
 
-    print(formated_header)
-    browser.get_display_data(line_count, print_func=disp_line)
+        print(formated_header)
+        browser.get_display_data(line_count, print_func=disp_line)
+    finally:
+        browser.close_file()
 
 
 def export(*args):
@@ -103,10 +117,21 @@ def get_args():
                    "objects": RunParams.TARGET_OBJECTS,
                    "name": RunParams.RELATION_NAME,
                    "target_no_header": RunParams.NFL,
-                   "target_cls_separator": RunParams.CLS_SEPARATOR}
+                   "target_cls_separator": RunParams.CLS_SEPARATOR,
+                   "target_sparse": RunParams.SPARSE}
     OTHER_ARGS = {"info": RunParams.SOURCE_INFO,
                   "skipped_lines": RunParams.SKIPPED_LINES,
-                  "skip_errors": RunParams.SKIP_ERRORS}
+                  "skip_errors": RunParams.SKIP_ERRORS,
+                  "single_pass": RunParams.SINGLE_PASS,
+                  "jobs": RunParams.JOBS,
+                  "cache": RunParams.CACHE,
+                  "batch": RunParams.BATCH,
+                  "preview_from": RunParams.PREVIEW_FROM,
+                  "progress": RunParams.PROGRESS,
+                  "spool_dir": RunParams.SPOOL_DIR,
+                  "spool_memory": RunParams.SPOOL_MEMORY,
+                  "spool_compress": RunParams.SPOOL_COMPRESS,
+                  "compress_level": RunParams.COMPRESS_LEVEL}
 
     USAGE = """swift-cli.py [source]
                     [-h] [-ss source_separator] [-ta target_attributesbutes] [-i]
@@ -115,7 +140,10 @@ def get_args():
                     [-cls classes] [-sf {csv,arff,dat,data,cxt,dtl}]
                     [-tf {csv,arff,dat,data,cxt,dtl}] [-c [rows_count]] [-p [rows_count]]
                     [-sl skipped_lines] [-se] [-scs source_cls_separatorarator]
-                    [-tcs target_cls_separator]"""
+                    [-tcs target_cls_separator] [-sp]
+                    [-tsp [{yes,no,auto}]] [-j jobs] [-ch [cache_dir]]
+                    [-b rows_count] [-pf row] [-pg] [-sd spool_dir]
+                    [-sm bytes] [-sc] [-cpl {0-9}]"""
 
     parser = argparse.ArgumentParser(prog=App.NAME, description=App.DESCRIPTION, usage=USAGE)
 
@@ -155,6 +183,37 @@ def get_args():
     parser.add_argument("-se", "--skip_errors", action="store_true", help="Skip broken lines, which cause an errors.")
     parser.add_argument("-scs", "--source_cls_separator", help="Separator which separates attributes and classes in source (will be read) C4.5 file format.")
     parser.add_argument("-tcs", "--target_cls_separator", help="Separator which separates attributes and classes in target (will be written) C4.5 file format.")
+    parser.add_argument("-tsp", "--target_sparse", nargs="?", const=DataArff.SPARSE_YES,
+                        choices=[DataArff.SPARSE_YES, DataArff.SPARSE_NO, DataArff.SPARSE_AUTO],
+                        help="""Write sparse ARFF data, omitted values are 0 (false). Option 'auto' writes sparse data
+                        only if the source is a binary context (DAT, DTL, CXT). Default is 'no'.""")
+    parser.add_argument("-sp", "--single_pass", action="store_true",
+                        help="Read the source file only once, converted lines are stored in a temporary file until the target header is written.")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Count of processes which convert data in parallel. Default is 1.")
+    parser.add_argument("-ch", "--cache", nargs="?", const=InfoCache.DEFAULT_DIR,
+                        help="""Cache information about the source data in the directory (default is '{}'),
+                        so unchanged source isn't read again.""".format(InfoCache.DEFAULT_DIR))
+    parser.add_argument("-b", "--batch", type=int,
+                        help="""Count of lines which are prepared at once, numeric and date attributes
+                        are scaled by columns using NumPy (if it is installed).""")
+    parser.add_argument("-pf", "--preview_from", type=int,
+                        help="""Index of the first data line displayed by --preview. With --cache offsets of lines
+                        are stored in the index file ('*{}') in the cache directory, so next preview seeks
+                        to the line directly.""".format(MappedSource.INDEX_SUFFIX))
+    parser.add_argument("-pg", "--progress", action="store_true",
+                        help="Print progress of reading and converting (rows/s, throughput, ETA) to the stderr.")
+    parser.add_argument("-sd", "--spool_dir",
+                        help="""Directory for temporary files with spooled data (lines of the stdin which must be read twice,
+                        converted lines in --single_pass mode). Default is the system temporary directory.""")
+    parser.add_argument("-sm", "--spool_memory", type=int,
+                        help="""Spooled data are kept in memory until their size exceeds this count of bytes,
+                        then they are moved to a temporary file. Default is 0, data are written to the file directly.""")
+    parser.add_argument("-sc", "--spool_compress", action="store_true",
+                        help="Compress spooled data by gzip.")
+    parser.add_argument("-cpl", "--compress_level", type=int, choices=range(10), metavar="{0-9}",
+                        help="""Compression level of the target file with suffix {}.
+                        Default is the default level of the compression.""".format(", ".join(sorted(COMPRESSIONS))))
 
     args = parser.parse_args()
 
@@ -180,6 +239,12 @@ def get_args():
                     action = ACTIONS[key]
                     action_arg = val
 
+    # compressed target is created again, because the compression level is known after all arguments are parsed
+    target = target_args.get(RunParams.TARGET)
+    if isinstance(target, CompressedFile) and RunParams.COMPRESS_LEVEL in other_args:
+        target.close()
+        target_args[RunParams.TARGET] = open_file(target.name, 'w', other_args[RunParams.COMPRESS_LEVEL])
+
     # this piece of code is for universal using -i --info
     file_extension = None
     try:
@@ -2,6 +2,8 @@
 
 from __future__ import print_function
 import re
+import ast
+import operator
 from collections import OrderedDict
 from pyparsing import quotedString, removeQuotes, ParseException
 from .date_parser_fca import DateParser
@@ -9,6 +11,11 @@ from .grammars_fca import boolexpr
 from .constants_fca import Bival, AttrType
 from .errors_fca import InvalidValueError, DateSyntaxError, DateValFormatError, FormulaRegexError
 
+try:
+    import numpy
+except ImportError:  # numpy is used only for scaling by columns (see AttrNumeric.scale_column)
+    numpy = None
+
 
 class Attribute:
     def __init__(self, index, name, attr_type=AttrType.NOT_SPECIFIED,
@@ -41,6 +48,10 @@ class Attribute:
     def attr_pattern(self):
         return self._attr_pattern
 
+    @property
+    def expr_pattern(self):
+        return self._expr_pattern
+
     @property
     def all_vals(self):
         return list(self._values_rate.keys())
@@ -106,14 +117,51 @@ class Attribute:
         self._unpack = value
 
     def process(self, value, none_val, scale, update):
+        if update:
+            self.update(value, none_val)
         if self._expr_pattern and scale:
             if none_val and value == none_val:  # result of scaling none value is False
                 return Bival.false()
             return self.scale(value)
-        if update:
-            self.update(value, none_val)
         return value
 
+    def get_processor(self, none_val, scale, update):
+        """
+        Return function of one value which gives the same result as process with these arguments,
+        or None if the value isn't changed by processing.
+        """
+        scale = scale and bool(self._expr_pattern)
+        attr_update = self.update
+        if not scale:
+            if not update:
+                return None
+
+            def process(value):
+                attr_update(value, none_val)
+                return value
+            return process
+
+        attr_scale = self.get_scaler()
+        false = Bival.false()
+        if update:
+            def process(value):
+                attr_update(value, none_val)
+                if none_val and value == none_val:  # result of scaling none value is False
+                    return false
+                return attr_scale(value)
+        elif none_val:
+            def process(value):
+                if value == none_val:
+                    return false
+                return attr_scale(value)
+        else:
+            process = attr_scale
+        return process
+
+    def get_scaler(self):
+        """Return function which is same as scale, used in get_processor"""
+        return self.scale
+
     def scale(self, value):
         return Bival.convert(value)
 
@@ -136,6 +184,17 @@ class Attribute:
             self._none_val_count += 1
             self._none_val = none_val
 
+    def get_state(self):
+        """
+        Return statistics of values collected by update, they can be restored by set_state.
+        State contains only built-in types, so it can be stored by marshal (see InfoCache).
+        """
+        return dict(self._values_rate), self._none_val, self._none_val_count
+
+    def set_state(self, state):
+        values_rate, self._none_val, self._none_val_count = state
+        self._values_rate = OrderedDict(values_rate)
+
     def get_formated_rate(self, aux_func=str):
         rate_sum = sum(self._values_rate.values()) + self._none_val_count
         rate_row = "    {}: {}/{} = {:.2%} {}\n"
@@ -156,13 +215,88 @@ class Attribute:
 
 class AttrNumeric(Attribute):
     ERROR_MSG = "Value must be numeric (integer or real)"
+    COMPARISONS = {ast.Lt: operator.lt, ast.LtE: operator.le,
+                   ast.Gt: operator.gt, ast.GtE: operator.ge,
+                   ast.Eq: operator.eq, ast.NotEq: operator.ne}
 
     def __init__(self, index, name, attr_type=AttrType.NUMERIC, attr_pattern=None, expr_pattern=None):
         super().__init__(index, name, attr_type,
                          attr_pattern, expr_pattern)
+        self._column_comparisons = None
         if self._expr_pattern:
             subst_expr_pattern = re.sub(r"[^E+<>!=0-9\s.-]+", "x", self._expr_pattern)
             self._evaled_expr_func = eval('lambda x:' + subst_expr_pattern)
+            self._column_comparisons = self._get_column_comparisons(subst_expr_pattern)
+
+    def _get_column_comparisons(self, expr):
+        """
+        Return list of tuples (comparison, left operand, right operand) of the expression,
+        operand None is the scaled value. Return None if the expression can't be used in scale_column.
+        """
+        try:
+            tree = ast.parse(expr, mode='eval').body
+            operands = []
+            for node in [tree.left] + tree.comparators:
+                if isinstance(node, ast.Name):
+                    operands.append(None)
+                    continue
+                value = ast.literal_eval(node)
+                if float(value) != value:  # comparison with float would be inaccurate
+                    return None
+                operands.append(float(value))
+            return [(self.COMPARISONS[type(op)], left, right)
+                    for op, left, right in zip(tree.ops, operands, operands[1:])]
+        except (SyntaxError, ValueError, TypeError, AttributeError, KeyError):
+            return None
+
+    def can_scale_column(self):
+        return numpy is not None and self._column_comparisons is not None
+
+    def get_number(self, value):
+        """Return value as number which is used in the scaling expression, raise ValueError for invalid value"""
+        return float(value)
+
+    def get_numbers(self, values):
+        """Same as get_number for sequence of values, return numpy array, values are parsed by numpy"""
+        return numpy.array(values, dtype=float)
+
+    def scale_column(self, values, none_val):
+        """
+        Scale sequence of values at once, result is same as scale called for every value.
+        Raise ValueError if some value is invalid, scale must be called for getting the right error.
+        """
+        none_mask = None
+        if none_val and none_val in values:
+            strings = numpy.array(values)
+            none_mask = strings == none_val
+            x = numpy.zeros(len(values))
+            x[~none_mask] = self.get_numbers(strings[~none_mask].tolist())
+        else:
+            x = self.get_numbers(values)
+        result = numpy.ones(len(values), bool)
+        for comparison, left, right in self._column_comparisons:
+            result &= comparison(x if left is None else left, x if right is None else right)
+        if none_mask is not None:  # result of scaling none value is False
+            result &= ~none_mask
+        return numpy.where(result, Bival.true(), Bival.false()).tolist()
+
+    def get_scaler(self):
+        expr_func = self._evaled_expr_func
+        true = Bival.true()
+        false = Bival.false()
+
+        def scale(value):
+            try:
+                x = float(value)
+            except ValueError:
+                raise InvalidValueError(AttrType.NUMERIC, self.ERROR_MSG)
+            result = expr_func(x)
+            if result is True:
+                return true
+            if result is False:
+                return false
+            return Bival.convert(result)
+        return scale
 
     def scale(self, value):
         try:
@@ -226,6 +360,15 @@ class AttrDate(AttrNumeric):
         except ParseException as e:
             raise DateSyntaxError(e.lineno, e.col, e.line, e)
 
+    def get_number(self, value):
+        return self.parser.get_time_stamp(value)
+
+    def get_numbers(self, values):
+        return numpy.fromiter(map(self.get_number, values), float, len(values))
+
+    def get_scaler(self):
+        return self.scale
+
     def scale(self, value):
         try:
             time_stamp = self.parser.get_time_stamp(value)
@@ -255,14 +398,15 @@ class AttrEnum(Attribute):
     def __init__(self, index, name, attr_pattern=None, expr_pattern=None, values=[]):
         super().__init__(index, name, AttrType.NOMINAL,
                          attr_pattern, expr_pattern)
-        self._values = values.copy()
+        # ordered set of values (keys, dictionary values are not used)
+        self._values = OrderedDict.fromkeys(values)
 
     @property
     def values(self):
         if self._expr_pattern:  # definitely scaling
             return [Bival.true(), Bival.false()]
         else:
-            return self._values.copy()
+            return list(self._values)
 
     def clear_values(self):
         self._values.clear()
@@ -272,10 +416,18 @@ class AttrEnum(Attribute):
 
     def update(self, value, none_val, step=1):
         if value not in self._values and value != none_val:
-            self._values.append(value)
+            self._values[value] = None
         super().update(value, none_val, step)
         return self
 
+    def get_state(self):
+        return super().get_state(), list(self._values)
+
+    def set_state(self, state):
+        rate_state, values = state
+        self._values = OrderedDict.fromkeys(values)
+        super().set_state(rate_state)
+
     def arff_repr(self, sep):
         return '{ ' + sep.join(self.values) + ' }'
 
@@ -0,0 +1,61 @@
+import os
+import marshal
+import hashlib
+import tempfile
+from .constants_fca import App
+
+
+class InfoCache:
+    """
+    On-disk cache of information which are collected by reading whole source data.
+    Entries are keyed by fingerprints of source files (path, size, modification time)
+    and by arguments which influence reading. Entries are dictionaries of built-in types
+    stored by marshal, so loading an entry can't execute code.
+    """
+
+    # must be incremented when format of cached information is changed
+    VERSION = 2
+    DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', App.NAME)
+    SUFFIX = '.info'
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self._directory = directory
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def get_key(self, files, *args):
+        """Return key of entry, or None if some of the files isn't a regular file"""
+        fingerprints = []
+        for path in files:
+            if not os.path.isfile(path):
+                return None
+            stat = os.stat(path)
+            fingerprints.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        return hashlib.sha1(repr((self.VERSION, fingerprints, args)).encode()).hexdigest()
+
+    def load(self, key):
+        """Return stored entry or None"""
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                entry = marshal.load(f)
+        except Exception:  # missing or damaged entry is same as no entry
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def store(self, key, entry):
+        """Store entry, errors are ignored because cache is only optional"""
+        temp_name = None
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self._directory, delete=False) as f:
+                temp_name = f.name
+                marshal.dump(entry, f)
+            os.replace(temp_name, self._get_path(key))
+        except (OSError, ValueError):  # ValueError is raised for unsupported type
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+
+    def _get_path(self, key):
+        return os.path.join(self._directory, key + self.SUFFIX)
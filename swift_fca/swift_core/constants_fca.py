@@ -23,6 +23,17 @@ class RunParams:
     SKIPPED_LINES = 'skipped_lines'
     SKIP_ERRORS = 'skip_errors'
     CLS_SEPARATOR = 'cls_separator'
+    SINGLE_PASS = 'single_pass'
+    SPARSE = 'sparse'
+    JOBS = 'jobs'
+    CACHE = 'cache'
+    BATCH = 'batch'
+    PREVIEW_FROM = 'preview_from'
+    PROGRESS = 'progress'
+    SPOOL_DIR = 'spool_dir'
+    SPOOL_MEMORY = 'spool_memory'
+    SPOOL_COMPRESS = 'spool_compress'
+    COMPRESS_LEVEL = 'compress_level'
 
 
 class FileType:
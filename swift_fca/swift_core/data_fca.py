@@ -1,22 +1,27 @@
 from __future__ import print_function
 import re
+import codecs
 import os
 import sys
-import tempfile
 import copy
-from collections import OrderedDict
+import marshal
+from collections import OrderedDict, Counter
+from itertools import chain
+from operator import itemgetter
 
-from .attributes_fca import (Attribute, AttrEnum)
+from .attributes_fca import (Attribute, AttrEnum, AttrNumeric)
 from .object_fca import Object
 from .parser_fca import FormulaParser, ArffParser, DataParser, parse_sequence
-from .constants_fca import Bival, FileType
+from .constants_fca import Bival, FileType, AttrType
+from .source_fca import map_source, BufferedTarget, PushbackSource, split_compression
 from .errors_fca import HeaderError, LineError, AttrError, InvalidValueError, FormulaKeyError, BivalError, NamesFileError, NotEnoughLinesError, ClassKeyError
 
 
 class Class:
     def __init__(self, key):
         self._key = key
-        self._values = []
+        # ordered set of values (keys, dictionary values are not used)
+        self._values = OrderedDict()
 
     @property
     def key(self):
@@ -24,12 +29,48 @@ class Class:
 
     @property
     def values(self):
-        return self._values.copy()
+        return list(self._values)
 
     def update_values(self, val):
         val = str(val)
         if val not in self._values:
-            self._values.append(val)
+            self._values[val] = None
+
+
+def get_items_getter(indexes):
+    """Return function which returns tuple of items on indexes of a list"""
+    if not indexes:
+        return lambda values: ()
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda values: (values[index],)
+    return itemgetter(*indexes)
+
+
+class BinaryRow:
+    """
+    Prepared line of binary context, only output positions of true values are stored.
+    Iteration gives the same prepared values as Data.prepare_line returns.
+    """
+
+    def __init__(self, true_indexes, length):
+        self._true_indexes = true_indexes
+        self._length = length
+
+    @property
+    def true_indexes(self):
+        """sorted positions of attributes with true value"""
+        return self._true_indexes
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        result = [Bival.false()] * self._length
+        true = Bival.true()
+        for i in self._true_indexes:
+            result[i] = true
+        return iter(result)
 
 
 class Data:
@@ -38,12 +79,19 @@ class Data:
     """Class data"""
 
     NONE_VAL = "?"
-    # bool_true, bool_false and prepared_val are indexes of
-    # proccesed value and specific bool value owned by attribute
-
-    PREPARED_VAL = 0
-    BOOL_TRUE = 1
-    BOOL_FALSE = 2
+    # escaped character in separator which isn't a letter, digit or underscore (e.g. '\\|')
+    ESCAPED_PUNCTUATION = re.compile(r'\\(\W)')
+
+    # data can be prepared in the same pass which collects informations about them (see spool_data_info)
+    SINGLE_PASS = True
+    # data are binary context, lines can be prepared as BinaryRow (see prepare_binary_line)
+    BINARY = False
+    # slots which are filled by reading whole data in get_header_info, they can be cached (see get_header_state)
+    HEADER_STATE = ()
+    # count of characters collected before they are written to the target (see buffer_target)
+    WRITE_BUFFER_SIZE = 1 << 18
+    # collected characters are encoded at once and written to the binary buffer of the target
+    BINARY_WRITE = False
 
     def __init__(self, source,
                  str_attrs=None, str_objects=None,
@@ -53,7 +101,8 @@ class Data:
         string representation and must be parsed
         """
         self._objects = []
-        self._source = source
+        # seekable source file is memory mapped (see MappedSource)
+        self._source = map_source(source)
         self._str_attrs = str_attrs
         self._str_objects = str_objects
         self._separator = separator
@@ -63,9 +112,8 @@ class Data:
         self._obj_count = 0
         self._attr_count = 0
         self._attr_count_no_classes = 0
-        self._temp_source = None
-        if not self.source.seekable():
-            self._temp_source = tempfile.TemporaryFile(mode='w+t', dir='./')
+        # lines of not seekable source are stored here when whole data are read (see iter_data_lines)
+        self._spool = None
 
         # attributes readed from data header
         self._header_attrs = []
@@ -77,6 +125,19 @@ class Data:
         self._classes = []
         # list if identifiers of attributes which are classes, sequence is parsed in get_attrs_info e.g "2-5, foo" -> [2, 3, 4, 5, foo]
         self._classes_keys_sequence = classes
+        # compiled regular expressions used in ss_str, keys are separators
+        self._splitters = {}
+        # output positions of every binary attribute, created in get_binary_plan
+        self._binary_plan = None
+        self._binary_plan_ready = False
+        # indexes of class values in source line, used in prepare_binary_line
+        self._binary_classes = []
+        # plans of prepare_line created by get_row_plan, keys are tuples (scale, update)
+        self._row_plans = {}
+        # true and false values of every attribute of written data, one for every position
+        # in prepared line, filled in write_header
+        self._trues = []
+        self._falses = []
 
         if self.str_objects:
             splitted = self.ss_str(self._str_objects, ',')
@@ -86,6 +147,10 @@ class Data:
     def source(self):
         return self._source
 
+    @source.setter
+    def source(self, value):
+        self._source = value
+
     @property
     def str_attrs(self):
         return self._str_attrs
@@ -137,7 +202,11 @@ class Data:
     def get_attrs_info(self, manager):
 
         # create header attributes and fill _header_attrs slot
-        self.get_header_info(manager)
+        if self.HEADER_STATE:
+            manager.read_cached(manager.CACHE_HEADER, lambda: self.get_header_info(manager),
+                                self.get_header_state, self.set_header_state)
+        else:
+            self.get_header_info(manager)
         self._classes_keys_sequence = parse_sequence(self._classes_keys_sequence, len(self._header_attrs)-1)
         for key in self._classes_keys_sequence:
             self._classes.append(Class(key))
@@ -206,15 +275,40 @@ class Data:
         """
         pass
 
+    def get_source_files(self):
+        """Return paths of files from which information about data are read"""
+        return [self._source.name]
+
+    def get_header_state(self):
+        """Return information read by get_header_info, see HEADER_STATE"""
+        return {slot: getattr(self, slot) for slot in self.HEADER_STATE}
+
+    def set_header_state(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def get_data_state(self):
+        """Return information read by get_data_info, they can be restored by set_data_state"""
+        return {'attributes': [attr.get_state() for attr in self._attributes],
+                'classes': [cls.values for cls in self._classes],
+                'obj_count': self._obj_count}
+
+    def set_data_state(self, state):
+        for attr, attr_state in zip(self._attributes, state['attributes']):
+            attr.set_state(attr_state)
+        for cls, values in zip(self._classes, state['classes']):
+            for val in values:
+                cls.update_values(val)
+        self._obj_count = state['obj_count']
+        self._source.seek(0)
+
     def get_data_info(self, manager, read=False):
         """Get much as possible information about data"""
 
         if read:
-            for index, line in enumerate(self.source):
-                if manager.stop or manager.skip_rest_lines(index):
-                    break
-                if manager.skip_line(index):
-                    continue
+            if hasattr(self._source, 'mark_line'):
+                self._source.mark_line(self.index_data_start)
+            for index, line in self.iter_data_lines(manager):
                 try:
                     str_values = self.prepare_line(line, index, scale=False, update=True)
                 except (LineError, AttrError) as e:
@@ -226,23 +320,98 @@ class Data:
                     continue
                 self._obj_count += 1
 
-                if self._temp_source:
-                    self._temp_source.write(line)
-                if manager.gui:
-                    manager.update_counter(line, self.index_data_start)
+                if manager.report_progress:
+                    manager.update_progress(line)
 
-            if self._temp_source:
-                self._source = self._temp_source
-            self._source.seek(0)
+            if manager.report_progress:
+                manager.progress.record_position()
+            self.rewind_data()
         else:
             self._index_data_start = 0  # Lines shouldn't be skipped in converter
 
+    def iter_data_lines(self, manager):
+        """
+        Same as manager.iter_lines of the source, used for reading whole data before they are converted.
+        Lines of not seekable source are also stored to the spool (see ManagerFca.open_spool),
+        rewind_data must be called after reading.
+        """
+        lines = self._source
+        if not lines.seekable():
+            self._spool = manager.open_spool(lines.name, text=True)
+            lines = self._spool.record(lines)
+        return manager.iter_lines(lines)
+
+    def rewind_data(self):
+        """Move to the beginning of the source, not seekable source is replaced by the spool with data lines"""
+        if self._spool:
+            self._source = self._spool.rewind()
+            self._spool = None
+            self._index_data_start = 0  # the spool contains only data lines
+        self._source.seek(0)
+
+    def spool_data_info(self, manager):
+        """
+        Same as get_data_info with read=True, but every line is also prepared
+        for writing and stored to the temporary file, so the source is read only once.
+        Return the temporary file with prepared lines, use read_spooled_lines for reading it.
+        """
+        spool = manager.open_spool()
+        for index, line in manager.iter_lines(self.source):
+            try:
+                prepared_line, classes = self.prepare_line(line, index, scale=True, update=True)
+            except (LineError, AttrError) as e:
+                if manager.skip_errors:
+                    manager.add_error(e)
+                    continue
+                raise e
+            if not prepared_line:  # current line is comment
+                continue
+            self._obj_count += 1
+            marshal.dump((prepared_line, classes), spool)
+
+            if manager.report_progress:
+                manager.update_progress(line)
+        return spool.rewind()
+
+    def read_spooled_lines(self, spool):
+        """Generator of prepared lines and classes stored by spool_data_info"""
+        while True:
+            try:
+                yield marshal.load(spool)
+            except EOFError:
+                return
+
     def prepare_line(self, values, line_i, scale=True, update=False):
-        """If return empty list -> line is comment"""
+        """
+        Return list of processed values, one for every attribute, and values of classes.
+        If return empty list -> line is comment
+        """
         if not isinstance(values, list):
             values = self.ss_str(values, self.separator)
         if not values:
             return values, None
+        plan = self.get_row_plan(scale, update)
+        if plan is None:
+            return self._prepare_line_exactly(values, line_i, scale, update)
+        get_values, processors, indexes, get_classes, update_classes = plan
+        try:
+            result = list(get_values(values))
+            classes_values = list(get_classes(values))
+        except IndexError:  # line is prepared again, so the missing value is reported exactly
+            return self._prepare_line_exactly(values, line_i, scale, update)
+        pos = None
+        try:
+            for pos, process in processors:
+                result[pos] = process(result[pos])
+        except InvalidValueError as e:
+            index = indexes[pos]
+            raise AttrError(line_i+1, ",".join(values), index+1, values[index], e)
+        for update_values, val in zip(update_classes, classes_values):
+            update_values(val)
+        return result, classes_values
+
+    def _prepare_line_exactly(self, values, line_i, scale, update):
+        """Same as prepare_line, but every value is processed separately, so errors are reported exactly"""
         result = []
         for attr in self._attributes:
             index = self._template_attrs[attr.key]
@@ -253,7 +422,7 @@ class Data:
             except InvalidValueError as e:
                 raise AttrError(line_i+1, ",".join(values), index+1, values[index], e)
 
-            result.append([new_value, attr.true, attr.false])
+            result.append(new_value)
 
         classes_values = []
         for cls in self._classes:
@@ -266,6 +435,36 @@ class Data:
             classes_values.append(val)
         return result, classes_values
 
+    def get_column_attrs(self):
+        """Return positions of attributes which can be scaled by columns (see AttrNumeric.scale_column)"""
+        return [pos for pos, attr in enumerate(self._attributes)
+                if isinstance(attr, AttrNumeric) and attr.can_scale_column()]
+
+    def prepare_lines(self, lines, column_attrs):
+        """
+        Prepare block of lines, lines are list of tuples (index, line).
+        Attributes on positions column_attrs are scaled by columns, other attributes are scaled as in prepare_line.
+        Return list of results of prepare_line. Errors aren't reported exactly,
+        lines must be prepared again by prepare_line if an exception is raised.
+        """
+        prepared = [self.prepare_line(line, index, scale=False) for index, line in lines]
+        rows = [prepared_line for prepared_line, classes in prepared if prepared_line]
+        if not rows:
+            return prepared
+        # rows are transposed to columns and back by zip, so values aren't moved one by one
+        columns = list(zip(*rows))
+        column_attrs = set(column_attrs)
+        for pos, attr in enumerate(self._attributes):
+            if not attr.expr_pattern:
+                continue
+            if pos in column_attrs:
+                columns[pos] = attr.scale_column(columns[pos], self._none_val)
+            else:
+                columns[pos] = [attr.process(val, self._none_val, True, False) for val in columns[pos]]
+        scaled_rows = iter(list(map(list, zip(*columns))))
+        return [(next(scaled_rows), classes) if prepared_line else (prepared_line, classes)
+                for prepared_line, classes in prepared]
+
     def unpack_attrs(self):
         unpacked = []
         for attr in self._attributes:
@@ -281,6 +480,97 @@ class Data:
                 unpacked.append(attr)
         self._attributes = unpacked
         self._attr_count = len(self._attributes)
+        self._binary_plan_ready = False
+        self._row_plans.clear()
+
+    def get_row_plan(self, scale, update):
+        """
+        Return tuple (values getter, list of tuples (position, processing function), indexes of values in line,
+        classes getter, list of update functions of classes) used by prepare_line with these arguments.
+        Values which aren't changed by processing haven't processing function.
+        Return None if some of the classes isn't in data, ClassKeyError is raised by prepare_line.
+        """
+        key = (scale, update)
+        if key not in self._row_plans:
+            self._row_plans[key] = self._create_row_plan(scale, update)
+        return self._row_plans[key]
+
+    def _create_row_plan(self, scale, update):
+        indexes = [self._template_attrs[attr.key] for attr in self._attributes]
+        processors = []
+        for pos, attr in enumerate(self._attributes):
+            process = attr.get_processor(self._none_val, scale, update)
+            if process is not None:
+                processors.append((pos, process))
+        try:
+            classes_indexes = [self._template_attrs[cls.key] for cls in self._classes]
+        except KeyError:
+            return None
+        return (get_items_getter(indexes), processors, indexes,
+                get_items_getter(classes_indexes), [cls.update_values for cls in self._classes])
+
+    def get_binary_plan(self):
+        """
+        Return list with output positions of attributes for every binary attribute index in source line.
+        Return None if lines can't be prepared as BinaryRow: data aren't binary context or some
+        of the attributes is scaled, is a class or has own bivalent values.
+        """
+        if not self._binary_plan_ready:
+            self._binary_plan = self._create_binary_plan()
+            self._binary_plan_ready = True
+        return self._binary_plan
+
+    def _create_binary_plan(self):
+        if not self.BINARY:
+            return None
+        width = self._attr_count_no_classes
+        plan = [[] for i in range(width)]
+        for pos, attr in enumerate(self._attributes):
+            index = self._template_attrs[attr.key]
+            if (index >= width or attr.expr_pattern or
+                    attr.true != Bival.true() or attr.false != Bival.false()):
+                return None
+            plan[index].append(pos)
+        try:
+            self._binary_classes = [self._template_attrs[cls.key] for cls in self._classes]
+        except KeyError:
+            return None  # ClassKeyError is raised by prepare_line
+        return plan
+
+    def prepare_binary_line(self, true_indexes, extra_values=()):
+        """
+        Prepare line of binary context without creating value for every attribute.
+        true_indexes are source indexes of attributes with true value, extra_values are
+        values behind binary attributes (classes in DTL).
+        Return BinaryRow and values of classes, or None if the line must be prepared by prepare_line.
+        """
+        plan = self._binary_plan
+        width = len(plan)
+        positions = []
+        for i in true_indexes:
+            if not 0 <= i < width:
+                return None
+            positions.extend(plan[i])
+        if len(true_indexes) > 1:
+            positions = sorted(set(positions))
+
+        classes_values = []
+        if self._classes:
+            true_set = set(true_indexes)
+            for cls, index in zip(self._classes, self._binary_classes):
+                if index < width:
+                    val = Bival.true() if index in true_set else Bival.false()
+                elif index - width < len(extra_values):
+                    val = extra_values[index - width]
+                else:
+                    return None
+                cls.update_values(val)
+                classes_values.append(val)
+        return BinaryRow(positions, len(self._attributes)), classes_values
+
+    def buffer_target(self):
+        """Written lines are collected and written at once, must be called before write_header"""
+        self._source = BufferedTarget(self._source, self.WRITE_BUFFER_SIZE, self.BINARY_WRITE)
 
     def write_line_to_file(self, line):
         """
@@ -295,24 +585,51 @@ class Data:
         Will write data to output in new format
         based on old_values - list of string values
         """
-        vals = list(map(lambda l: l[self.PREPARED_VAL], prepered_line))
-        self.write_line_to_file(vals)
+        self.write_line_to_file(prepered_line)
 
     def write_header(self, old_data):
-        """This method should be rewritten in child class"""
-        pass
+        """
+        This method should be rewritten in child class, but called by it,
+        true and false values of attributes of old_data are remembered for write_line
+        """
+        self._trues = [attr.true for attr in old_data.attributes]
+        self._falses = [attr.false for attr in old_data.attributes]
 
     def ss_str(self, string, separator, max_split=0):
         """
         Strip and split string by separator. Ignore escaped separators.
         Return list of values.
         """
-        result = list(map(lambda x: x.strip(),
-                          re.split(r'(?<!\\)' + separator, string, max_split)))
+        separator, splitter = self._get_splitter(separator)
+        if '\\' in string:
+            splitted = splitter.split(string, max_split)
+        else:  # there is no escaped separator
+            splitted = string.split(separator, max_split or -1)
+        result = [x.strip() for x in splitted]
         if len(result) == 1 and not result[0]:
             return []
         return result
 
+    def _get_splitter(self, separator):
+        """
+        Return separator with decoded escape sequences (e.g. '\\t' typed
+        on command line) and compiled regular expression which splits
+        by not escaped separator. Escaped punctuation (e.g. '\\|') is
+        the plain character, as it was when separator was a regular expression.
+        """
+        try:
+            return self._splitters[separator]
+        except KeyError:
+            decoded = separator
+            if '\\' in separator:
+                decoded = self.ESCAPED_PUNCTUATION.sub(
+                    lambda m: m.group(0) if m.group(1) == '\\' else m.group(1), separator)
+                decoded = codecs.decode(decoded.encode('latin-1', 'backslashreplace'),
+                                        'unicode_escape')
+            splitter = re.compile(r'(?<!\\)' + re.escape(decoded))
+            self._splitters[separator] = (decoded, splitter)
+            return decoded, splitter
+
     def print_info(self, out_file=sys.stdout):
         print("Relation name: {}".format(self.relation_name), file=out_file)
         print("Objects count: {}".format(self.obj_count), file=out_file)
@@ -323,17 +640,25 @@ class Data:
 
     @staticmethod
     def skip_lines(line_i, f):
+        if line_i and hasattr(f, 'seek_line') and f.tell() == 0:
+            f.seek_line(line_i)
+            return
         file_iter = iter(f)
         for i in range(line_i):
             next(file_iter)
 
-    def check_value_bival(self, values):
-        prepared_val = values[self.PREPARED_VAL]
-        true_val = values[self.BOOL_TRUE]
-        false_val = values[self.BOOL_FALSE]
-        if not ((prepared_val == true_val) or
-                (prepared_val == false_val)):
-            raise BivalError(prepared_val, true_val, false_val)
+    def get_true_positions(self, prepared_line):
+        """
+        Return positions of true values in prepared line, see write_header.
+        Raise BivalError if some value is neither true nor false.
+        """
+        result = []
+        for i, (val, true_val, false_val) in enumerate(zip(prepared_line, self._trues, self._falses)):
+            if val == true_val:
+                result.append(i)
+            elif val != false_val:
+                raise BivalError(val, true_val, false_val)
+        return result
 
 
 class DataArff(Data):
@@ -341,14 +666,6 @@ class DataArff(Data):
 
     FORMAT = FileType.ARFF
 
-    def __init__(self, source,
-                 str_attrs=None, str_objects=None,
-                 separator=',', relation_name='',
-                 none_val=Data.NONE_VAL, classes="", **kwargs):
-        super().__init__(source, str_attrs, str_objects,
-                         separator, relation_name, none_val, classes)
-        self._parser = ArffParser(separator)
-
     NUMERIC = "numeric"
     STRING = "string"
     DATE = "date"
@@ -357,21 +674,88 @@ class DataArff(Data):
     RELATION = "@relation"
     DATA = "@data"
 
+    # values of sparse argument
+    SPARSE_YES = "yes"
+    SPARSE_NO = "no"
+    SPARSE_AUTO = "auto"  # sparse data are written if the source is binary context
+    SPARSE_AUTO_FORMATS = [FileType.DAT, FileType.DTL, FileType.CXT]
+
+    def __init__(self, source,
+                 str_attrs=None, str_objects=None,
+                 separator=',', relation_name='',
+                 none_val=Data.NONE_VAL, classes="", sparse=SPARSE_NO, **kwargs):
+        super().__init__(source, str_attrs, str_objects,
+                         separator, relation_name, none_val, classes)
+        self._parser = ArffParser(separator)
+        self._sparse = sparse
+        # values which are omitted in sparse data, one for every attribute (None -> value is never omitted)
+        self._sparse_defaults = []
+        # all omitted values are false, so BinaryRow can be written directly
+        self._sparse_binary = False
+
     def write_header(self, old_data):
+        super().write_header(old_data)
         if not self.relation_name:
             self._relation_name = old_data.relation_name
+        if self._sparse == self.SPARSE_AUTO:
+            self._sparse = self.SPARSE_YES if old_data.FORMAT in self.SPARSE_AUTO_FORMATS else self.SPARSE_NO
 
         # write relation name
         self._source.write(self.RELATION + ' ' + self.relation_name + '\n\n')
 
         for attr in old_data.attributes:
+            if self._sparse == self.SPARSE_YES:
+                attr_repr = self._get_sparse_repr(attr)
+            else:
+                attr_repr = attr.arff_repr(self.separator)
             line = (self.ATTRIBUTE + ' ' + str(attr.name) + ' '
-                    + attr.arff_repr(self.separator) + '\n')
+                    + attr_repr + '\n')
             self._source.write(line)
 
+        self._sparse_binary = all(default == Bival.false() for default in self._sparse_defaults)
+
         # write data symbol
         self._source.write('\n' + self.DATA + '\n')
 
+    def write_line(self, prepared_line, classes=None):
+        if self._sparse != self.SPARSE_YES:
+            return super().write_line(prepared_line, classes)
+        if isinstance(prepared_line, BinaryRow) and self._sparse_binary:
+            values = ['{} {}'.format(i, Bival.true()) for i in prepared_line.true_indexes]
+            self._source.write(ArffParser.SPARSE_START + self.separator.join(values) + ArffParser.SPARSE_END + '\n')
+            return
+        values = []
+        for i, (val, default) in enumerate(zip(prepared_line, self._sparse_defaults)):
+            if val != default:
+                values.append('{} {}'.format(i, val))
+        self._source.write(ArffParser.SPARSE_START + self.separator.join(values) + ArffParser.SPARSE_END + '\n')
+
+    def _get_sparse_repr(self, attr):
+        """
+        Return ARFF representation of attribute used in sparse data and store value,
+        which will be omitted. Bivalent nominal values are written with false value first,
+        so the false values are omitted.
+        """
+        bivals = [Bival.false(), Bival.true()]
+        default = None
+        attr_repr = attr.arff_repr(self.separator)
+        if type(attr) is Attribute:  # not specified type is written as bivalent
+            values = bivals
+        elif type(attr) is AttrEnum:
+            values = attr.values
+            if sorted(values) == sorted(bivals):
+                values = bivals
+        else:
+            values = None
+            if attr.attr_type == AttrType.NUMERIC:
+                default = '0'
+        if values is not None:
+            attr_repr = '{ ' + self.separator.join(values) + ' }'
+            if values:
+                default = values[0]
+        self._sparse_defaults.append(default)
+        return attr_repr
+
     def get_header_info(self, manager=None):
         header = self._get_header_str()
         self._parser.parse(header)
@@ -386,8 +770,6 @@ class DataArff(Data):
         header_to_parse = ''
         for line in self.source:
             header_to_parse += line
-            if self._temp_source:
-                self._temp_source.write(line)
             if line.strip() == '@data':
                 break
         return header_to_parse
@@ -407,6 +789,7 @@ class DataCsv(Data):
                          separator, relation_name, none_val, classes)
 
     def write_header(self, old_data):
+        super().write_header(old_data)
         if self._attrs_first_line:
             attrs_name = []
             for attr in old_data.attributes:
@@ -431,10 +814,11 @@ class DataCsv(Data):
             line = next(self._source)
         except StopIteration:
             raise NotEnoughLinesError(self.source.name)
-        if self._temp_source:
-            self._temp_source.write(line)
-        elif not move:
-            self._source.seek(0)
+        if not move:
+            if self._source.seekable():
+                self._source.seek(0)
+            else:  # the line is data line, it must be read again
+                self._source = PushbackSource(self._source, [line])
         return line
 
 
@@ -451,6 +835,7 @@ class DataData(Data):
         self._class = None
 
     def write_header(self, old_data):
+        super().write_header(old_data)
         if old_data.classes:
             self._class = old_data.classes[0]  # only first class is excepted by c4.5 format
 
@@ -477,14 +862,16 @@ class DataData(Data):
         self._header_attrs = parser.attributes
 
     def write_line(self, prepered_line, classes=None):
-        vals = list(map(lambda l: l[self.PREPARED_VAL], prepered_line))
         if classes:
-            vals.extend(classes)
-        self.write_line_to_file(vals)
+            prepered_line = chain(prepered_line, classes)
+        self.write_line_to_file(prepered_line)
+
+    def get_source_files(self):
+        return super().get_source_files() + [self._get_name_file(self._source.name)]
 
-    """return file name with suffix .names"""
+    """return file name with suffix .names, names file of compressed data isn't compressed"""
     def _get_name_file(self, source):
-        return ".".join([os.path.splitext(source)[0], "names"])
+        return ".".join([os.path.splitext(split_compression(source)[0])[0], "names"])
 
 
 class DataCxt(Data):
@@ -494,6 +881,8 @@ class DataCxt(Data):
     FORMAT = FileType.CXT
     DOT = '.'
     CROSS = 'X'
+    BINARY = True
+    BINARY_WRITE = True
 
     def __init__(self, source,
                  str_attrs=None, str_objects=None,
@@ -541,7 +930,19 @@ class DataCxt(Data):
         self._index_data_start = self.current_line
 
     def prepare_line(self, line, index, scale=True, update=False):
-        splitted = list(line.strip())
+        stripped = line.strip()
+        # line contains only crosses and dots
+        if (not update and len(stripped) == self._attr_count_no_classes and
+                not stripped.strip(self.CROSS + self.DOT) and self.get_binary_plan() is not None):
+            true_indexes = []
+            pos = stripped.find(self.CROSS)
+            while pos >= 0:
+                true_indexes.append(pos)
+                pos = stripped.find(self.CROSS, pos + 1)
+            prepared = self.prepare_binary_line(true_indexes)
+            if prepared is not None:
+                return prepared
+        splitted = list(stripped)
         result = []
         for val_i, val in enumerate(splitted):
             try:
@@ -551,6 +952,7 @@ class DataCxt(Data):
         return super().prepare_line(result, index, scale, update)
 
     def write_header(self, old_data):
+        super().write_header(old_data)
         target = self._source
         attrs_to_write = old_data.attributes
         if not self._objects:
@@ -568,13 +970,13 @@ class DataCxt(Data):
             target.write(attr.name + '\n')
 
     def write_line(self, prepared_line, classes=None):
-        result = []
-        for vals in prepared_line:
-            self.check_value_bival(vals)
-            if vals[self.PREPARED_VAL] == vals[self.BOOL_TRUE]:
-                result.append(self.CROSS)
-            else:
-                result.append(self.DOT)
+        if isinstance(prepared_line, BinaryRow):
+            true_positions = prepared_line.true_indexes
+        else:
+            true_positions = self.get_true_positions(prepared_line)
+        result = [self.DOT] * len(prepared_line)
+        for i in true_positions:
+            result[i] = self.CROSS
         self.write_line_to_file(result)
 
     def get_not_empty_line(self):
@@ -594,6 +996,10 @@ class DataDatBase(Data):
 
     FORMAT = FileType.DAT
     ERROR_DESCRIPTION = "Invalid value: '{}'. Value must be integer."
+    # all data are read already in get_header_info
+    SINGLE_PASS = False
+    BINARY = True
+    HEADER_STATE = ('_header_attrs', '_attr_count', '_obj_count')
 
     def __init__(self, source,
                  str_attrs=None, str_objects=None,
@@ -604,62 +1010,80 @@ class DataDatBase(Data):
     def get_data_header_info(self, manager):
         max_val = -1
         line_count = 0
-        attributes = OrderedDict()
-        for i, line in enumerate(self.source):
-            if manager.stop or manager.skip_rest_lines(i):
-                break
-            if manager.skip_line(i):
-                continue
+        # count of true values and count of lines with true value, for every attribute
+        true_counts = Counter()
+        true_lines = Counter()
+        for i, line in self.iter_data_lines(manager):
             line_count += 1
             splitted = self.parse_line(line)
-            updated_attrs = {}
+            indexes = []
             for col, val in enumerate(splitted):
                 try:
-                    int_val = int(val)
+                    indexes.append(int(val))
                 except ValueError:
                     e = LineError(self.FORMAT, i+1, col+1, line, self.ERROR_DESCRIPTION.format(val))
                     if manager.skip_errors:
                         manager.add_error(e)
                         continue
                     raise e
-                if int_val > max_val:
-                    max_val = int_val
-
-                if int_val not in attributes:
-                    attributes[int_val] = AttrEnum(int_val, str(int_val)).update(Bival.false(), self._none_val, step=line_count-1)
-                attributes[int_val].update(Bival.true(), self._none_val)
-                updated_attrs[int_val] = attributes[int_val]
+            if indexes:
+                max_val = max(max_val, max(indexes))
+                true_counts.update(indexes)
+                true_lines.update(set(indexes))
 
-            for i in range(max_val + 1):
-                if i not in attributes:
-                    attributes[i] = AttrEnum(i, str(i)).update(Bival.false(), self._none_val, step=line_count-1)
-                if i not in updated_attrs:
-                    attributes[i].update(Bival.false(), self._none_val)
+            if manager.report_progress:
+                manager.update_progress(line)
 
-            if self._temp_source:
-                self._temp_source.write(line)
-
-            if manager.gui:
-                manager.update_counter(line, self.index_data_start)
-
-        if self._temp_source:
-            self._source = self._temp_source
-        self._source.seek(0)
+        if manager.report_progress:
+            manager.progress.record_position()
+        self.rewind_data()
 
         self._attr_count = max_val + 1
         self._obj_count = line_count
 
-        sorted_attrs = OrderedDict(sorted(attributes.items(), key=lambda t: t))
-        self._header_attrs = list(sorted_attrs.values())
+        # false values are counted from count of lines, where attribute isn't
+        self._header_attrs = []
+        for index in sorted(true_counts.keys() | set(range(max_val + 1))):
+            attr = AttrEnum(index, str(index))
+            attr.update(Bival.false(), self._none_val, step=line_count-true_lines[index])
+            if true_counts[index]:
+                attr.update(Bival.true(), self._none_val, step=true_counts[index])
+            self._header_attrs.append(attr)
 
     def get_header_info(self, manager=None):
         self.get_data_header_info(manager)
 
+    def get_header_state(self):
+        state = super().get_header_state()
+        state['_header_attrs'] = [(attr.index, attr.name, attr.is_class, attr.get_state())
+                                  for attr in self._header_attrs]
+        return state
+
+    def set_header_state(self, state):
+        state = dict(state)
+        self._header_attrs = []
+        for index, name, is_class, attr_state in state.pop('_header_attrs'):
+            attr = AttrEnum(index, name)
+            attr.is_class = is_class
+            attr.set_state(attr_state)
+            self._header_attrs.append(attr)
+        super().set_header_state(state)
+
     def get_data_info(self, manager, read=False):
         for cls in self._classes:
             cls.update_values(Bival.true())
             cls.update_values(Bival.false())
 
+    def get_true_indexes(self, str_indexes, index, line):
+        """Return list of indexes of attributes with true value"""
+        result = []
+        for col, val in enumerate(self.split_line(str_indexes)):
+            try:
+                result.append(int(val))
+            except ValueError:
+                raise LineError(self.FORMAT, index+1, col+1, line, self.ERROR_DESCRIPTION.format(val))
+        return result
+
     def get_prepared_indexes(self, str_indexes, index, line):
         splitted = self.split_line(str_indexes)
         result = [Bival.false()] * (self._attr_count_no_classes)
@@ -674,12 +1098,9 @@ class DataDatBase(Data):
         return super().prepare_line(values, index, scale, update)
 
     def write_line(self, line, classes=None):
-        result = []
-        for i, vals in enumerate(line):
-            self.check_value_bival(vals)
-            if vals[self.PREPARED_VAL] == vals[self.BOOL_TRUE]:
-                result.append(str(i))
-        return result
+        if isinstance(line, BinaryRow):
+            return [str(i) for i in line.true_indexes]
+        return [str(i) for i in self.get_true_positions(line)]
 
     def split_line(self, line):
         result = []
@@ -692,10 +1113,16 @@ class DataDatBase(Data):
 
 
 class DataDat(DataDatBase):
+    BINARY_WRITE = True
+
     def parse_line(self, line):
         return self.split_line(line)
 
     def prepare_line(self, line, index, scale=True, update=False):
+        if not update and self.get_binary_plan() is not None:
+            prepared = self.prepare_binary_line(self.get_true_indexes(line, index, line))
+            if prepared is not None:
+                return prepared
         result = self.get_prepared_indexes(line, index, line)
         return super().prepare_line(result, index, scale, update)
 
@@ -717,6 +1144,8 @@ class DataDtl(DataDatBase):
     4|b aa
 
     """
+    HEADER_STATE = DataDatBase.HEADER_STATE + ('_classes_from_source_file',)
+
     def __init__(self, source,
                  str_attrs=None, str_objects=None,
                  separator=' ', relation_name='', classes="", cls_separator='|', **kwargs):
@@ -740,8 +1169,26 @@ class DataDtl(DataDatBase):
         indexes, sep, classes = line.partition(self._class_sep)
         return indexes, classes.strip()
 
+    def get_header_state(self):
+        state = super().get_header_state()
+        # classes are the last header attributes (see get_data_header_info)
+        state['_classes_from_source_file'] = list(self._classes_from_source_file)
+        return state
+
+    def set_header_state(self, state):
+        state = dict(state)
+        keys = state.pop('_classes_from_source_file')
+        super().set_header_state(state)
+        classes = self._header_attrs[len(self._header_attrs) - len(keys):] if keys else []
+        self._classes_from_source_file = OrderedDict(zip(keys, classes))
+
     def prepare_line(self, line, index, scale=True, update=False):
         str_indexes, classes = self.get_indexes_classes(line)
+        if not update and self.get_binary_plan() is not None:
+            prepared = self.prepare_binary_line(self.get_true_indexes(str_indexes, index, line),
+                                                self.split_line(classes))
+            if prepared is not None:
+                return prepared
         result = self.get_prepared_indexes(str_indexes, index, line)
         result.extend(self.split_line(classes))
         return super().prepare_line(result, index, scale, update)
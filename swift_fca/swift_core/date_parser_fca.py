@@ -1,16 +1,37 @@
+import re
 from datetime import datetime
 
 
 class DateParser():
 
     ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+    # dates in ISO_FORMAT which can be parsed by datetime.fromisoformat with the same result as strptime
+    ISO_DATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}')
+    # maximal count of remembered time stamps, all are forgotten when it is reached
+    MEMO_SIZE = 10000
 
     def __init__(self, pattern):
         self._pattern = pattern
+        self._iso = pattern == self.ISO_FORMAT
+        # parsed dates, keys are dates, values time stamps
+        self._memo = {}
 
     def get_time_stamp(self, date):
-        date = datetime.strptime(date, self._pattern)
-        return date.timestamp()
+        try:
+            return self._memo[date]
+        except KeyError:
+            pass
+        if self._iso and self.ISO_DATE.fullmatch(date):
+            try:
+                time_stamp = datetime.fromisoformat(date).timestamp()
+            except ValueError:  # strptime is used for raising the same error
+                time_stamp = datetime.strptime(date, self._pattern).timestamp()
+        else:
+            time_stamp = datetime.strptime(date, self._pattern).timestamp()
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[date] = time_stamp
+        return time_stamp
 
     def get_format(self):
         return self._pattern
@@ -43,6 +43,7 @@ class ErrorMessage:
     SKIPPED_ERRORS = "Following errors were skipped: "
     SKIPPED_ERRORS_HEADER = "Skipped Errors"
     SAME_ST_NAME_ERROR = "The target file and the source file can't have the same name."""
+    PREVIEW_BACK_ERROR = "Lines which were already read can't be displayed again, the source can't be memory mapped."
 
 
 class SwiftError(Exception):
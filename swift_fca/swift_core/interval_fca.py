@@ -1,4 +1,5 @@
 from math import isinf
+from bisect import bisect_right
 
 
 class Interval:
@@ -13,6 +14,14 @@ class Interval:
     def __str__(self):
         return "{}-{}".format(self._val_from, self._val_to)
 
+    @property
+    def val_from(self):
+        return self._val_from
+
+    @property
+    def val_to(self):
+        return self._val_to
+
     def is_open(self):
         return bool(isinf(self._val_to))
 
@@ -20,22 +29,45 @@ class Interval:
 class Intervals:
 
     def __init__(self, intervals):
-        self._open_intervals = []
-        self._closed_intervals = []
+        # all values from the beginning of the first open interval are in open intervals
+        self._open_from = float('inf')
+        closed = []
         for i in intervals:
             if i.is_open():
-                self._open_intervals.append(i)
+                self._open_from = min(self._open_from, i.val_from)
+            elif i.val_from <= i.val_to:
+                closed.append((i.val_from, i.val_to))
+
+        # closed intervals are merged and sorted by beginnings, so they can be searched by bisect
+        self._closed_from = []
+        self._closed_to = []
+        for val_from, val_to in sorted(closed):
+            if self._closed_to and val_from <= self._closed_to[-1]:
+                self._closed_to[-1] = max(self._closed_to[-1], val_to)
             else:
-                self._closed_intervals.append(i)
+                self._closed_from.append(val_from)
+                self._closed_to.append(val_to)
 
     def val_in_open_interval(self, value):
-        return self.val_in(self._open_intervals, value)
+        return value >= self._open_from
 
     def val_in_closed_interval(self, value):
-        return self.val_in(self._closed_intervals, value)
+        i = bisect_right(self._closed_from, value) - 1
+        return i >= 0 and value <= self._closed_to[i]
 
-    def val_in(self, intervals, value):
-        for interval in intervals:
-            if value in interval:
-                return True
-        return False
+    def get_ranges(self, value=0):
+        """
+        Return sorted list of tuples (from, to) of merged intervals which contain values greater
+        or equal to the value (from is at least the value). The last range is open (to is inf)
+        if there is any open interval.
+        """
+        ranges = []
+        i = max(bisect_right(self._closed_from, value) - 1, 0)
+        for val_from, val_to in zip(self._closed_from[i:], self._closed_to[i:]):
+            if val_from >= self._open_from:
+                break
+            if val_to >= value:
+                ranges.append((max(val_from, value), min(val_to, self._open_from)))
+        if not isinf(self._open_from):
+            ranges.append((max(self._open_from, value), float('inf')))
+        return ranges
@@ -1,11 +1,21 @@
 from __future__ import print_function
+import io
 import os
 import sys
 import time
-from .data_fca import Data, DataCsv, DataArff, DataDat, DataCxt, DataData, DataDtl
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from math import ceil, floor, isinf
+from .data_fca import Data, BinaryRow, DataCsv, DataArff, DataDat, DataCxt, DataData, DataDtl
 from .constants_fca import FileType, RunParams, App
 from .parser_fca import parse_intervals
 from .errors_fca import ArgError, ErrorMessage, LineError, AttrError
+from .source_fca import MappedSource, Spool, CompressedFile, split_compression
+from .cache_fca import InfoCache
 
 
 class Fake:
@@ -43,17 +53,35 @@ class ManagerFca(MANAGER_PARENT):
 
     # Signals
     if App.gui:
-        next_percent = QtCore.pyqtSignal()
+        next_percent = QtCore.pyqtSignal(int)
 
-    def __init__(self, source, skipped_lines=None, skip_errors=False):
+    # parts of cache entry
+    CACHE_HEADER = 'header'
+    CACHE_DATA = 'data'
+
+    def __init__(self, source, skipped_lines=None, skip_errors=False, cache=None, progress=False,
+                 spool_dir=None, spool_memory=0, spool_compress=False):
         super().__init__()
         self._gui = False
+        # progress is printed to stderr
+        self._print_progress = progress
         self._stop = False
-        self._counter = None
+        self._progress = None
         self._source_from_stdin = not source.seekable()
         self._skipped_lines = parse_intervals(skipped_lines)
+        self._skipped_lines_str = skipped_lines
+        # True if the last iter_lines ended before the end of lines
+        self._lines_stopped = False
         self._skip_errors = skip_errors
         self._errors = []
+        # information about source data are read from/stored to the cache directory
+        self._cache = InfoCache(cache) if cache else None
+        self._cache_key = None
+        self._cache_entry = {}
+        # arguments of spools created by open_spool
+        self._spool_dir = spool_dir
+        self._spool_memory = spool_memory
+        self._spool_compress = spool_compress
 
     @property
     def gui(self):
@@ -92,12 +120,109 @@ class ManagerFca(MANAGER_PARENT):
     def skip_rest_lines(self, i):
         return self._skipped_lines.val_in_open_interval(i)
 
-    def update_percent(self):
+    def iter_lines(self, lines, first_index=0):
+        """
+        Generator of tuples (index, line) of lines which aren't skipped (see skip_line, skip_rest_lines),
+        first_index is index of the first line. Ranges of skipped lines are passed without testing every line,
+        in memory mapped source they are passed by seeking (see MappedSource.skip_lines).
+        Generator ends when the rest of lines is skipped or when stop is set (then lines_stopped is True).
+        """
+        self._lines_stopped = False
+        # skipped lines of memory mapped source are passed by seeking
+        source = lines if isinstance(lines, MappedSource) else None
+        lines = iter(lines)
+        index = first_index
+        for val_from, val_to in self._skipped_lines.get_ranges(first_index):
+            for line in islice(lines, max(ceil(val_from) - index, 0)):
+                if self.stop:
+                    self._lines_stopped = True
+                    return
+                yield index, line
+                index += 1
+            if index < ceil(val_from):  # there aren't more lines
+                return
+            if isinf(val_to):
+                self._lines_stopped = True
+                return
+            skipped = max(floor(val_to) + 1 - index, 0)
+            if source:
+                source.skip_lines(skipped)
+            else:
+                next(islice(lines, skipped, skipped), None)
+            index += skipped
+        for line in lines:
+            if self.stop:
+                self._lines_stopped = True
+                return
+            yield index, line
+            index += 1
+
+    @property
+    def lines_stopped(self):
+        return self._lines_stopped
+
+    def update_percent(self, progress):
+        """Called by Progress at most once per Progress.INTERVAL seconds"""
         if App.gui:
-            self.next_percent.emit()
+            self.next_percent.emit(progress.percent)
+        if self._print_progress:
+            print("\r{:<80}".format(str(progress)), end='', file=sys.stderr)
 
-    def update_counter(self, line, index):
-        self._counter.update(line, index)
+    def finish_progress(self):
+        """Print the final progress, must be called before the source is closed"""
+        if self._print_progress and self._progress and self._progress.rows:
+            print("\r{:<80}".format(str(self._progress)), file=sys.stderr)
+
+    @property
+    def report_progress(self):
+        """True if update_progress should be called for every processed line"""
+        return self._gui or self._print_progress
+
+    @property
+    def progress(self):
+        return self._progress
+
+    def update_progress(self, line):
+        self._progress.update(line)
+
+    def open_cache(self, data, args):
+        """Load cache entry of source data, args are arguments used for creating data"""
+        if not self._cache:
+            return
+        # offsets of lines found by seeking are stored in the cache directory too
+        if isinstance(data.source, MappedSource):
+            data.source.open_index(self._cache.directory)
+        data_args = sorted((key, str(val)) for key, val in args.items() if key != RunParams.SOURCE)
+        self._cache_key = self._cache.get_key(data.get_source_files(), type(data).__name__, data_args,
+                                              self._skipped_lines_str, self._skip_errors)
+        if self._cache_key:
+            self._cache_entry = self._cache.load(self._cache_key) or {}
+
+    def read_cached(self, part, read, get_state, set_state):
+        """
+        Restore information from the part of cache entry by set_state,
+        or call read and store information returned by get_state to the cache.
+        Errors which were skipped during reading are cached too.
+        """
+        if part in self._cache_entry:
+            state, errors = self._cache_entry[part]
+            set_state(state)
+            self._errors.extend(errors)
+            return
+        errors_count = len(self._errors)
+        read()
+        if self._cache_key and not self.stop:
+            self._cache_entry[part] = (get_state(), self._errors[errors_count:])
+            self._cache.store(self._cache_key, self._cache_entry)
+
+    def read_data_info(self, data):
+        """Same as data.get_data_info with read=True, but information can be read from cache"""
+        self.read_cached(self.CACHE_DATA, lambda: data.get_data_info(self, read=True),
+                         data.get_data_state, data.set_data_state)
+
+    def open_spool(self, name=None, text=False):
+        """Return new Spool for data which are read again later, name is name of the spooled source"""
+        return Spool(self._spool_dir, self._spool_memory, self._spool_compress, text, name)
 
     def print_formated_errors(self):
         if self.errors:
@@ -109,8 +234,8 @@ class ManagerFca(MANAGER_PARENT):
             ext = ".{}".format(args[RunParams.FORMAT])
         elif path == sys.stdin.name or path == sys.stdout.name:  # stream from stdin -> file extension must be set
             raise ArgError(RunParams.FORMAT)
-        else:
-            ext = os.path.splitext(path)[1]
+        else:  # suffix of compressed file (e.g. data.csv.gz) is omitted
+            ext = os.path.splitext(split_compression(path)[0])[1]
         return ext
 
     def get_data_class(self, ext):
@@ -121,15 +246,23 @@ class ManagerFca(MANAGER_PARENT):
 
 
 class Printer(ManagerFca):
-    def __init__(self, kwargs, skipped_lines=None, skip_errors=False, **unused):
-        super().__init__(kwargs[RunParams.SOURCE], skipped_lines, skip_errors)
+    def __init__(self, kwargs, skipped_lines=None, skip_errors=False, cache=None, progress=False,
+                 spool_dir=None, spool_memory=0, spool_compress=False, **unused):
+        super().__init__(kwargs[RunParams.SOURCE], skipped_lines, skip_errors, cache, progress,
+                         spool_dir, spool_memory, spool_compress)
         self._file_path = kwargs[RunParams.SOURCE].name
         self._data = self.get_data_class(self.get_extension(kwargs[RunParams.SOURCE].name, kwargs))(**kwargs)
+        self.open_cache(self._data, kwargs)
 
     def read_info(self):
-        self._counter = EstimateCounter(self._file_path, self)
-        self._data.get_attrs_info(self)
-        self._data.get_data_info(self, read=True)
+        self._progress = Progress(self, source=self._data.source)
+        try:
+            self._data.get_attrs_info(self)
+            self.read_data_info(self._data)
+        finally:
+            # offsets of lines found while reading are stored when the source is closed
+            self._data.source.close()
+        self.finish_progress()
 
     def print_info(self, f):
         self._data.print_info(out_file=f)
@@ -138,15 +271,61 @@ class Printer(ManagerFca):
 
 
 class Browser(ManagerFca):
-    def __init__(self, kwargs, skipped_lines=None, skip_errors=False, **unused):
-        super().__init__(kwargs[RunParams.SOURCE], skipped_lines, skip_errors)
-        self._opened_file = kwargs[RunParams.SOURCE]
+    def __init__(self, kwargs, skipped_lines=None, skip_errors=False, cache=None, progress=False,
+                 spool_dir=None, spool_memory=0, spool_compress=False, **unused):
+        super().__init__(kwargs[RunParams.SOURCE], skipped_lines, skip_errors, cache, progress,
+                         spool_dir, spool_memory, spool_compress)
         self._data = self.get_data_class(self.get_extension(kwargs[RunParams.SOURCE].name, kwargs))(**kwargs)
+        self._opened_file = self._data.source
+        self.open_cache(self._data, kwargs)
         self._curr_line_index = -1
+        # lines which aren't skipped, created in the first get_display_data
+        self._lines = None
+        # index of the first data line in memory mapped source, set in read_info
+        self._first_line_index = None
+        # index of the first line returned by the last get_display_data
+        self._display_from = None
 
     def read_info(self):
-        self._counter = EstimateCounter(self._opened_file.name, self)
+        self._progress = Progress(self, source=self._opened_file)
         self._data.get_attrs_info(self)
+        self.finish_progress()
+        # not seekable source is replaced by spool or PushbackSource while the header is read
+        self._opened_file = self._data.source
+        if isinstance(self._opened_file, MappedSource):
+            self._first_line_index = self._opened_file.get_line_index()
+
+    @property
+    def can_seek(self):
+        """True if seek_row can move also to lines which were already read"""
+        return self._first_line_index is not None
+
+    @property
+    def next_line_index(self):
+        """Index of the line after the last line taken by get_display_data"""
+        return self._curr_line_index + 1
+
+    @property
+    def display_from(self):
+        """Index of the first line returned by the last get_display_data, None if no line was returned"""
+        return self._display_from
+
+    def seek_row(self, row):
+        """
+        Next get_display_data starts from the data line with the index row.
+        Memory mapped source is moved straight to the row (see MappedSource.seek_line),
+        other sources can only be read forward to the row.
+        """
+        row = max(row, 0)
+        if self._first_line_index is not None:
+            self._opened_file.seek_line(self._first_line_index + row)
+        else:
+            next_index = self._curr_line_index + 1
+            if row < next_index:
+                raise ArgError(message=ErrorMessage.PREVIEW_BACK_ERROR)
+            next(islice(self._opened_file, row - next_index, row - next_index), None)
+        self._curr_line_index = row - 1
+        self._lines = self.iter_lines(self._opened_file, row)
 
     def __del__(self):
         self._opened_file.close()
@@ -154,24 +333,20 @@ class Browser(ManagerFca):
     def get_header(self):
         return list(map(lambda x: x.name, self._data.attributes))
 
-    def get_display_data(self, count, print_func=None):
-        count = float(count)
-        END_FILE = -1
-        to_display = []
-
-        i = 0
-        while i < count:
-            self._curr_line_index += 1
-            line = next(self._opened_file, END_FILE)
-
-            if line == END_FILE or self.skip_rest_lines(self._curr_line_index):
-                break
-            if self.skip_line(self._curr_line_index):
-                continue
+    def iter_display_data(self):
+        """
+        Generator of tuples (index, prepared line) of lines which are displayed,
+        comments are omitted and broken lines are skipped if skip_errors is set.
+        """
+        if self._lines is None:
+            self._lines = self.iter_lines(self._opened_file)
 
+        for index, line in self._lines:
+            self._curr_line_index = index
             try:
-                prepared_line, classes = self._data.prepare_line(line.strip(), self._curr_line_index, False)
-                prepared_line = list(map(lambda l: l[Data.PREPARED_VAL], prepared_line))
+                prepared_line, classes = self._data.prepare_line(line.strip(), index, False)
+                if isinstance(prepared_line, BinaryRow):  # displayed lines are indexed
+                    prepared_line = list(prepared_line)
             except (LineError, AttrError) as e:
                 if self.skip_errors:
                     self.add_error(e)
@@ -180,12 +355,18 @@ class Browser(ManagerFca):
 
             if not prepared_line:  # line is comment
                 continue
+            yield index, prepared_line
 
+    def get_display_data(self, count, print_func=None):
+        to_display = []
+        self._display_from = None
+        for index, prepared_line in islice(self.iter_display_data(), max(int(count), 0)):
+            if self._display_from is None:
+                self._display_from = index
             if print_func:  # used for display data from stdin (stream data)
-                print_func(prepared_line, self._curr_line_index)
+                print_func(prepared_line, index)
             else:
                 to_display.append(prepared_line)
-            i += 1
         self.print_formated_errors()
         return to_display
 
@@ -193,10 +374,143 @@ class Browser(ManagerFca):
         self._opened_file.close()
 
 
+class PrefetchBrowser(Browser):
+    """
+    Browser which prepares next lines on a background thread into a bounded queue,
+    so get_display_data mostly takes lines which are already prepared.
+    Items of the queue are tuples (index of line, prepared line or error).
+    Errors of broken lines (skipped or raised) are passed through the queue too,
+    so get_display_data adds or raises them in the same order as Browser.
+    """
+
+    # maximal count of prepared lines waiting in the queue
+    QUEUE_SIZE = 1000
+    # seconds after which the background thread blocked by full queue checks stop
+    POLL_INTERVAL = 0.1
+    # marks the end of lines in the queue
+    END = None
+
+    def __init__(self, kwargs, **params):
+        super().__init__(kwargs, **params)
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._thread = None
+        self._prefetch_end = False
+        self._next_line_index = 0
+
+    def read_info(self):
+        super().read_info()
+        if not self.stop:
+            self._start_prefetch()
+
+    def _start_prefetch(self):
+        self._prefetch_end = False
+        self._thread = threading.Thread(target=self._prefetch, daemon=True)
+        self._thread.start()
+
+    def _stop_prefetch(self):
+        """Stop the background thread and forget prepared lines"""
+        if self._thread:
+            self.stop = True
+            self._thread.join()
+            self.stop = False
+            self._thread = None
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+
+    def _put(self, item):
+        """Put item to the queue, return False if the thread should stop"""
+        while not self.stop:
+            try:
+                self._queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def add_error(self, e):
+        if threading.current_thread() is self._thread:
+            self._put((self._curr_line_index, str(e)))  # added when it is taken from the queue
+        else:
+            super().add_error(e)
+
+    def _prefetch(self):
+        while True:
+            try:
+                for item in self.iter_display_data():
+                    if not self._put(item):
+                        return
+            except (LineError, AttrError) as e:  # following lines are prepared as in Browser
+                if not self._put((self._curr_line_index, e)):
+                    return
+                continue
+            except Exception as e:
+                self._put((self._curr_line_index, e))
+                return
+            self._put(self.END)
+            return
+
+    @property
+    def next_line_index(self):
+        return self._next_line_index
+
+    def seek_row(self, row):
+        self._stop_prefetch()
+        super().seek_row(row)
+        self._next_line_index = max(row, 0)
+        self._start_prefetch()
+
+    def get_display_data(self, count, print_func=None, ready_only=False):
+        """
+        Return at most count prepared lines. If ready_only is True, it waits only for the first line
+        and the others are returned only if they are already prepared.
+        """
+        to_display = []
+        self._display_from = None
+        wait = True
+        while len(to_display) < count and not self._prefetch_end:
+            try:
+                item = self._queue.get(block=wait)
+            except queue.Empty:
+                break
+            wait = not ready_only
+            if item is self.END:
+                self._prefetch_end = True
+                continue
+            index, value = item
+            self._next_line_index = index + 1
+            if isinstance(value, str):  # skipped error
+                self._errors.append(value)
+            elif isinstance(value, Exception):
+                if not isinstance(value, (LineError, AttrError)):
+                    self._prefetch_end = True
+                raise value
+            else:
+                prepared_line = value
+                if self._display_from is None:
+                    self._display_from = index
+                if print_func:
+                    print_func(prepared_line, index)
+                else:
+                    to_display.append(prepared_line)
+        self.print_formated_errors()
+        return to_display
+
+    def close_file(self):
+        self._stop_prefetch()
+        super().close_file()
+
+
 class Convertor(ManagerFca):
+    # data are split into (jobs * CHUNKS_PER_JOB) chunks in parallel conversion
+    CHUNKS_PER_JOB = 4
+    # maximal size of chunk in bytes, more chunks are used for bigger data,
+    # because converted chunks are held in memory until they are written
+    MAX_CHUNK_SIZE = 1 << 22
+
     def __init__(self, old, new, print_info=False,
-                 skipped_lines=None, skip_errors=False, **kwargs):
-        super().__init__(old[RunParams.SOURCE], skipped_lines, skip_errors)
+                 skipped_lines=None, skip_errors=False, single_pass=False, jobs=1, cache=None, batch=0,
+                 progress=False, spool_dir=None, spool_memory=0, spool_compress=False, **kwargs):
+        super().__init__(old[RunParams.SOURCE], skipped_lines, skip_errors, cache, progress,
+                         spool_dir, spool_memory, spool_compress)
         self._source_ext = self.get_extension(old[RunParams.SOURCE].name, old)
         self._target_ext = self.get_extension(new[RunParams.TARGET].name, new)
 
@@ -204,54 +518,122 @@ class Convertor(ManagerFca):
         self._target_cls = self.get_data_class(self._target_ext)
         self._old_data = self._source_cls(**old)
         self._new_data = self._target_cls(**new)
+        self.open_cache(self._old_data, old)
 
         self._print_info = print_info
+        self._single_pass = single_pass
+        # temporary file with prepared lines, used in single pass mode
+        self._spool = None
+        # count of processes which convert data in parallel
+        self._jobs = jobs
+        # index of currently converted line, used for finding line which raised an error
+        self._line_index = 0
+        # count of lines which are prepared at once in _convert_batches
+        self._batch = batch
+        # positions of attributes which are scaled by columns in batches
+        self._column_attrs = []
         self._info_file = sys.stdout
         if new[RunParams.TARGET].name == sys.stdout.name and print_info:
-            self._info_file = open("{}.info".format(os.path.splitext(old[RunParams.SOURCE].name)[0]), "w")
+            source_name = split_compression(old[RunParams.SOURCE].name)[0]
+            self._info_file = open("{}.info".format(os.path.splitext(source_name)[0]), "w")
 
     @property
     def source_line_count(self):
         return self._source_line_count
 
     def read_info(self):
-        self._counter = EstimateCounter(self._old_data.source.name, self, gui=self._gui)
+        self._progress = Progress(self, source=self._old_data.source)
         # get information from source data
         unpack = self._old_data.get_attrs_info(self)
         if unpack:
-            self._old_data.get_data_info(self, read=True)
+            self.read_data_info(self._old_data)
             self._old_data.unpack_attrs()
         else:
             read_data = self.READ_DATA[self._source_ext + self._target_ext]
             if self._print_info:
                 read_data = True
-            self._old_data.get_data_info(self, read=read_data)
+            if not read_data:
+                self._old_data.get_data_info(self, read=False)
+            # not seekable source would be spooled anyway, prepared lines are spooled instead
+            elif ((self._single_pass or self.source_from_stdin) and self._old_data.SINGLE_PASS and
+                    self.CACHE_DATA not in self._cache_entry):
+                self._spool = self._old_data.spool_data_info(self)
+            else:
+                self.read_data_info(self._old_data)
 
         if self._print_info:
             self._old_data.print_info(self._info_file)
         # this is for progress bar
         self._source_line_count = self._old_data.obj_count
+        self.finish_progress()
 
     def convert(self):
         """
         Method for converting data.
         Before calling this, must be called read_info method !
         """
-        if self.source_line_count == 0:
-            self._counter = EstimateCounter(self._old_data.source.name, self, gui=self._gui)
-        else:
-            self._counter = Counter(self._source_line_count, self, gui=self._gui)
+        self._new_data.buffer_target()
+        try:
+            self._convert()
+        except BaseException:
+            self._new_data.source.flush()  # lines converted before the error are written too
+            raise
 
+    def _convert(self):
         source_file = self._old_data.source
+        # lines of spooled data are read from the temporary file, not from the source
+        self._progress = Progress(self, self._source_line_count, self._spool or source_file)
         # write header part
         self._new_data.write_header(self._old_data)
+        if self._spool:
+            self._convert_spooled()
+            source_file.close()
+            return
         # skip header lines
         Data.skip_lines(self._old_data.index_data_start, source_file)
-        for i, line in enumerate(source_file):
-            if self.stop or self.skip_rest_lines(i):
-                break
-            if self.skip_line(i):
+        if self._batch > 1:
+            self._column_attrs = self._old_data.get_column_attrs()
+        if not self._convert_parallel(source_file):
+            self._convert_lines(source_file)
+        self.finish_progress()
+        self._new_data.source.close()
+        source_file.close()
+        self.print_formated_errors()
+
+    def _convert_lines(self, lines, first_index=0):
+        """Convert and write lines, return False if the conversion was stopped"""
+        indexed_lines = self.iter_lines(lines, first_index)
+        if self._column_attrs:
+            self._convert_batches(indexed_lines)
+        else:
+            self._convert_rows(indexed_lines)
+        return not self.lines_stopped
+
+    def _convert_batches(self, indexed_lines):
+        """
+        Same as _convert_rows, but blocks of self._batch lines are prepared at once (see Data.prepare_lines).
+        Block which raises an error is converted again line by line.
+        """
+        while True:
+            block = list(islice(indexed_lines, self._batch))
+            if not block:
+                return
+            try:
+                prepared = self._old_data.prepare_lines(block, self._column_attrs)
+            except Exception:
+                self._convert_rows(block)
                 continue
+            for (i, line), (prepared_line, classes) in zip(block, prepared):
+                self._line_index = i
+                if not prepared_line:  # line is comment
+                    continue
+                self._new_data.write_line(prepared_line, classes)
+                self._progress.update(line)
+
+    def _convert_rows(self, indexed_lines):
+        """Convert and write lines one by one, indexed_lines are tuples (index, line)"""
+        for i, line in indexed_lines:
+            self._line_index = i
             try:
                 prepared_line, classes = self._old_data.prepare_line(line, i)
             except (LineError, AttrError) as e:
@@ -262,59 +644,228 @@ class Convertor(ManagerFca):
             if not prepared_line:  # line is comment
                 continue
             self._new_data.write_line(prepared_line, classes)
-            self._counter.update(line, self._old_data.index_data_start)
+            self._progress.update(line)
+
+    def _convert_parallel(self, source_file):
+        """
+        Convert data by chunks in self._jobs processes, chunks are written in the original order.
+        Return False if the data can't be converted in parallel.
+        """
+        global _chunk_convertor
+        if self._jobs <= 1 or self._gui or not isinstance(source_file, MappedSource):
+            return False
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:  # fork is not supported on this platform
+            return False
+        start = source_file.tell()
+        count = max(self._jobs * self.CHUNKS_PER_JOB, ceil((source_file.size - start) / self.MAX_CHUNK_SIZE))
+        chunks = source_file.get_chunks(start, count)
+        if len(chunks) < 2:
+            return False
+
+        first_indexes = []
+        first_index = 0
+        for offset, count in chunks:
+            first_indexes.append(first_index)
+            first_index += count
+
+        target = self._new_data.source
+        target.flush()  # forked processes mustn't inherit buffered data
+        _chunk_convertor = self
+        try:
+            with ProcessPoolExecutor(self._jobs, mp_context=context) as executor:
+                chunk_args = zip(chunks, first_indexes)
+                pending = deque(executor.submit(_convert_chunk, *args)
+                                for args in islice(chunk_args, 2 * self._jobs))
+                end_offsets = [offset for offset, count in chunks[1:]] + [source_file.seek(0, io.SEEK_END)]
+                for (offset, count), first_index, end_offset in zip(chunks, first_indexes, end_offsets):
+                    output, errors, finished, error_index = pending.popleft().result()
+                    for args in islice(chunk_args, 1):
+                        pending.append(executor.submit(_convert_chunk, *args))
+                    target.write(output)
+                    self._errors.extend(errors)
+                    source_file.seek(end_offset)  # position of the source shows the progress
+                    self._progress.add_rows(count)
+                    if error_index is not None:
+                        # convert the rest of chunk again, so the error is raised here
+                        source_file.seek(offset)
+                        lines = islice(source_file, error_index - first_index, count)
+                        finished = self._convert_lines(lines, error_index)
+                    if not finished:
+                        for future in pending:
+                            future.cancel()
+                        break
+        finally:
+            _chunk_convertor = None
+        return True
+
+    def _convert_spooled(self):
+        """Write lines prepared in read_info (single pass mode)"""
+        for prepared_line, classes in self._old_data.read_spooled_lines(self._spool):
+            if self.stop:
+                break
+            self._new_data.write_line(prepared_line, classes)
+            self._progress.update()
+        self.finish_progress()
+        self._spool.close()
         self._new_data.source.close()
-        source_file.close()
         self.print_formated_errors()
 
 
-class EstimateCounter():
-    def __init__(self, data_file, manager, gui=True):
-        self.gui = gui
-        self.proc_line_count = 0
-        self.proc_line_size_sum = 0
-        self.base_line_size = sys.getsizeof("")
-        self.current_percent = 0
-        self.data_size = 0
-        if os.path.isfile(data_file):
-            self.data_size = os.path.getsize(data_file)
-        self.manager = manager
-
-    def update(self, line, index_data_start):
-        self.proc_line_count += 1
-        if self.proc_line_count < 10:
-            curr_line_size = sys.getsizeof(line) - self.base_line_size
-            self.proc_line_size_sum += curr_line_size
-            average_line_size = self.proc_line_size_sum / self.proc_line_count
-
-            # becuase of header lines
-            if self.proc_line_count == 1:
-                self.data_size = self.data_size - (index_data_start * average_line_size)
-
-            average_line_count = self.data_size / average_line_size
-            self.one_percent = round(average_line_count / 100)
-
-        if self.current_percent == self.one_percent:
-            self.current_percent = 0
-            self.manager.update_percent()
-            if self.gui:
-                time.sleep(0.02)
-        else:
-            self.current_percent += 1
-
-
-class Counter():
-    def __init__(self, maximum, manager, gui=True):
-        self.gui = gui
-        self._current_percent = 0
-        self._one_percent = round(maximum / 100)
-        self.manager = manager
-
-    def update(self, line=None, index_data_start=None):
-        if self._current_percent == self._one_percent:
-            self._current_percent = 0
-            self.manager.update_percent()
-            if self.gui:
-                time.sleep(0.02)
-        else:
-            self._current_percent += 1
+# convertor used by processes of parallel conversion, it is inherited by fork
+_chunk_convertor = None
+
+
+def _convert_chunk(chunk, first_index):
+    """
+    Convert lines of one chunk in a forked process.
+    Return converted text, skipped errors, False if the conversion was stopped
+    and index of line which raised an error (or None).
+    """
+    convertor = _chunk_convertor
+    offset, count = chunk
+    source = convertor._old_data.source
+    output = io.StringIO()
+    convertor._new_data.source = output
+    convertor._print_progress = False  # progress is printed by the parent process
+    errors_count = len(convertor._errors)
+    source.seek(offset)
+    error_index = None
+    finished = True
+    try:
+        finished = convertor._convert_lines(islice(source, count), first_index)
+    except Exception:
+        error_index = convertor._line_index
+    errors = convertor._errors[errors_count:]
+    del convertor._errors[errors_count:]
+    return output.getvalue(), errors, finished, error_index
+
+
+class Progress:
+    """
+    Progress of processing lines, update is called for every processed line and takes O(1) time.
+    The manager is informed about the progress (see ManagerFca.update_percent)
+    at most once per INTERVAL seconds, time is checked only after every CHECK_LINES lines.
+    Processed bytes are given by position of the binary stream under the source (or memory mapped source)
+    and compared with the size of the source file. If the position isn't known (e.g. stdin),
+    percents are computed from count of rows (if total_rows is known) or from characters of processed lines.
+    Processed bytes of spooled data are given by position in the temporary file (see Spool.file_tell).
+    """
+
+    # minimal count of seconds between two reports
+    INTERVAL = 0.2
+    CHECK_LINES = 64
+
+    def __init__(self, manager, total_rows=0, source=None):
+        self._manager = manager
+        self._total_rows = total_rows
+        self._position = self.get_position_func(source)
+        self._total_bytes = 0
+        if source is not None and not isinstance(source, Spool) and os.path.isfile(source.name):
+            self._total_bytes = os.path.getsize(source.name)
+        self._start_position = self._position() if self._position else 0
+        self._rows = 0
+        # processed bytes, counted from lines only if the position isn't known
+        self._bytes = 0
+        self._start = time.monotonic()
+        self._next_report = self._start + self.INTERVAL
+        self._unchecked = self.CHECK_LINES
+
+    @staticmethod
+    def get_position_func(source):
+        """Return function which returns position of binary stream under the source, or None"""
+        if isinstance(source, MappedSource):
+            return source.tell
+        if isinstance(source, Spool):
+            return source.file_tell
+        if isinstance(source, CompressedFile):  # compared with size of the compressed file
+            return source.compressed_tell
+        try:
+            raw = source.buffer.raw
+            if raw.seekable():
+                return raw.tell
+        except (AttributeError, OSError, ValueError):
+            pass
+        return None
+
+    def update(self, line=None):
+        self._rows += 1
+        if line is not None and not self._position:
+            self._bytes += len(line)
+        self._unchecked -= 1
+        if not self._unchecked:
+            self._unchecked = self.CHECK_LINES
+            self._report()
+
+    def add_rows(self, count):
+        """Same as update called count times, used for lines processed elsewhere"""
+        self._rows += count
+        self._report()
+
+    def _report(self):
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._next_report = now + self.INTERVAL
+            self._manager.update_percent(self)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def record_position(self):
+        """Remember processed bytes, must be called before the source is seeked back (see Data.rewind_data)"""
+        if self._position:
+            try:  # source can be read more times (seeked back), processed bytes don't decrease
+                self._bytes = max(self._bytes, self._position() - self._start_position)
+            except ValueError:  # source is closed, last known position is used
+                pass
+
+    @property
+    def bytes(self):
+        self.record_position()
+        return self._bytes
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    @property
+    def rows_per_sec(self):
+        return self._rows / max(self.elapsed, 1e-9)
+
+    @property
+    def bytes_per_sec(self):
+        return self.bytes / max(self.elapsed, 1e-9)
+
+    @property
+    def fraction(self):
+        """Processed part of data (0 - 1), None if it is unknown"""
+        if self._position and self._total_bytes:
+            return min((self._start_position + self.bytes) / self._total_bytes, 1)
+        if self._total_rows:
+            return min(self._rows / self._total_rows, 1)
+        if self._total_bytes:
+            return min(self._bytes / self._total_bytes, 1)
+        return None
+
+    @property
+    def percent(self):
+        fraction = self.fraction
+        return int(fraction * 100) if fraction is not None else 0
+
+    @property
+    def eta(self):
+        """Estimated count of remaining seconds, None if it is unknown"""
+        fraction = self.fraction
+        if not fraction:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+    def __str__(self):
+        text = "{} rows, {:.1f} MB, {:.0f} rows/s, {:.1f} MB/s".format(
+            self._rows, self.bytes / 1e6, self.rows_per_sec, self.bytes_per_sec / 1e6)
+        eta = self.eta
+        if eta is not None:
+            text += ", {}%, ETA {}s".format(self.percent, round(eta))
+        return text
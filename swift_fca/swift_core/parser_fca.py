@@ -1,3 +1,4 @@
+import re
 from pyparsing import (Or, Empty, CharsNotIn, ZeroOrMore, nums, LineEnd,
                        Group, removeQuotes, Literal, restOfLine, lineno, ParseException,
                        Optional, delimitedList, printables, OneOrMore, Forward,
@@ -179,6 +180,15 @@ class ArffParser(Parser):
     <comment_line> ::= <comment> "\n"
     """
 
+    COMMENT = '%'
+    SPARSE_START = '{'
+    SPARSE_END = '}'
+    SPARSE_INDEX = re.compile(r'[0-9]+')
+    WHITE_SPACE = re.compile(r'[ \n\t\r]*')
+    # beginning of quoted value without closing quote, patterns are the same as pyparsing quotedString uses
+    QUOTED_START = {'"': re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*'),
+                    "'": re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*")}
+
     def __init__(self, separator):
         super().__init__()
         self._relation_name = ''
@@ -186,8 +196,11 @@ class ArffParser(Parser):
         self._separator = separator
         # first level relational attribute occurrences
         self._rel_occur = []
-        self._delim_list_parser = self._delim_list(separator)
-        self._rel_delim_list_parser = self._relational_delim_list(separator)
+        # values used for omitted values in sparse data, one list of values for every first level attribute
+        self._sparse_defaults = []
+        # unquoted value of data line, it is the same as pyparsing Word(printables, excludeChars=('%' + sep))
+        self._word = re.compile(r'[^\s%' + re.escape(separator) + ']+')
+        self._sparse_word = re.compile(r'[^\s%' + re.escape(separator + self.SPARSE_END) + ']+')
 
     @property
     def relation_name(self):
@@ -232,18 +245,57 @@ class ArffParser(Parser):
 
         self._relation_name = result.rel_name
         self._find_relational(result.children)
+        self._sparse_defaults = [self._get_sparse_defaults(attr) for attr in result.children]
         self._linearize_attrs(result.children)
         self._data_start = result.data_start
         self._index = 0
 
     def parse_line(self, line, index):
-        if not line.strip():
+        """
+        Split data line (instance) to values, return empty list for blank and comment line.
+        Quoted values are kept with quotes, except the values of relational attributes,
+        which are split to values of their children.
+        """
+        if '\t' in line:
+            line = line.expandtabs()  # columns in error messages are counted with expanded tabs
+        pos = self.WHITE_SPACE.match(line).end()
+        if pos == len(line) or line[pos] == self.COMMENT:
             return []
-        self._index = 0
-        try:
-            result = self._rel_delim_list_parser.parseString(line, parseAll=True).asList()
-        except ParseException as e:
-            raise LineError(FileType.ARFF, index, e.col, line, e)
+        if line[pos] == self.SPARSE_START:
+            return self._parse_sparse_line(line, index, pos)
+
+        sep = self._separator
+        result = []
+        first_level_i = 0
+        end, quoted = self._scan_value(line, pos)
+        if end < 0:
+            raise self._line_error(line, index, pos, "Expected value")
+        while True:
+            relational_values = None
+            if quoted and first_level_i in self._rel_occur:
+                relational_values = self._split_relational(line[pos+1:end-1])
+                if not relational_values:  # quoted value is read as unquoted if it can't be split
+                    match = self._word.match(line, pos)
+                    if not match:
+                        raise self._line_error(line, index, pos, "Expected value")
+                    end = match.end()
+            if relational_values:
+                result.extend(relational_values)
+            else:
+                result.append(line[pos:end])
+            first_level_i += 1
+
+            next_pos = self.WHITE_SPACE.match(line, end).end()
+            if not line.startswith(sep, next_pos):
+                break
+            pos = self.WHITE_SPACE.match(line, next_pos + len(sep)).end()
+            end_value, quoted = self._scan_value(line, pos)
+            if end_value < 0:
+                break
+            end = end_value
+
+        if next_pos != len(line):
+            raise self._line_error(line, index, next_pos, "Expected end of text")
         return result
 
     def show_result(self):
@@ -288,28 +340,93 @@ class ArffParser(Parser):
             if attr.has_children():
                 self._rel_occur.append(i)
 
-    def _parse_rel(self, value, sep):
-        if self._index in self._rel_occur:
-            rel = self._delim_list_parser.parseString(str(value))
-            return rel
-
-    def _inc_index(self):
-        self._index += 1
-
-    def _delim_list(self, sep):
-        quoted = quotedString.copy()
-        value = quoted | Word(printables,  excludeChars=('%' + sep))
-        parser = delimitedList(value, delim=sep)
-        return parser
-
-    def _relational_delim_list(self, sep):
-        quoted = quotedString.copy()
-        quoted.setParseAction(lambda s, p, t: self._parse_rel(removeQuotes(s, p, t), sep))
-        value = quoted | Word(printables,  excludeChars=('%' + sep))
-        value.setParseAction(self._inc_index)
-        comment = self._comment()
-        parser = comment | delimitedList(value, delim=sep)
-        return parser
+    def _parse_sparse_line(self, line, index, pos):
+        """
+        Parse sparse instance e.g. {1 X, 3 Y}, where every value is preceded by index of its attribute.
+        Omitted values are replaced by default values (0 or the first value of nominal attribute).
+        """
+        sep = self._separator
+        values = self._sparse_defaults.copy()
+        pos = self.WHITE_SPACE.match(line, pos + 1).end()
+        while not line.startswith(self.SPARSE_END, pos):
+            match = self.SPARSE_INDEX.match(line, pos)
+            if not match:
+                raise self._line_error(line, index, pos, "Expected attribute index")
+            attr_i = int(match.group())
+            if attr_i >= len(values):
+                raise self._line_error(line, index, pos, "Attribute index {} is out of range".format(attr_i))
+            pos = self.WHITE_SPACE.match(line, match.end()).end()
+            end, quoted = -1, False
+            if pos > match.end():
+                end, quoted = self._scan_value(line, pos, self._sparse_word)
+            if end < 0:
+                raise self._line_error(line, index, pos, "Expected value")
+
+            relational_values = None
+            if quoted and attr_i in self._rel_occur:
+                relational_values = self._split_relational(line[pos+1:end-1])
+            if relational_values:
+                values[attr_i] = relational_values
+            else:
+                values[attr_i] = [line[pos:end]]
+
+            pos = self.WHITE_SPACE.match(line, end).end()
+            if line.startswith(sep, pos):
+                pos = self.WHITE_SPACE.match(line, pos + len(sep)).end()
+            elif not line.startswith(self.SPARSE_END, pos):
+                raise self._line_error(line, index, pos, "Expected '{}' or '{}'".format(sep, self.SPARSE_END))
+
+        pos = self.WHITE_SPACE.match(line, pos + len(self.SPARSE_END)).end()
+        if pos != len(line):
+            raise self._line_error(line, index, pos, "Expected end of text")
+        return [val for attr_values in values for val in attr_values]
+
+    def _get_sparse_defaults(self, attr):
+        """Return list of default values of (first level) attribute, for relational attribute values of its children"""
+        if attr.has_children():
+            defaults = []
+            for child in attr.children:
+                defaults.extend(self._get_sparse_defaults(child))
+            return defaults
+        if isinstance(attr, AttrEnum) and attr.values:
+            return [attr.values[0]]
+        if isinstance(attr, AttrDate):
+            return [attr.parser.time_stamp_to_str(0)]
+        return ['0']
+
+    def _scan_value(self, line, pos, word=None):
+        """
+        Return end of the value which starts at pos (-1 if there is no value)
+        and information if the value is quoted.
+        """
+        quote = line[pos:pos+1]
+        if quote in self.QUOTED_START:
+            end = self.QUOTED_START[quote].match(line, pos).end()
+            if line.startswith(quote, end):
+                return end + 1, True
+        match = (word or self._word).match(line, pos)
+        if match:
+            return match.end(), False
+        return -1, False
+
+    def _split_relational(self, value):
+        """Split quoted value of relational attribute (without quotes) to values of its children"""
+        sep = self._separator
+        result = []
+        pos = self.WHITE_SPACE.match(value).end()
+        while True:
+            end, quoted = self._scan_value(value, pos)
+            if end < 0:
+                return result
+            result.append(value[pos:end])
+            next_pos = self.WHITE_SPACE.match(value, end).end()
+            if not value.startswith(sep, next_pos):
+                return result
+            pos = self.WHITE_SPACE.match(value, next_pos + len(sep)).end()
+
+    def _line_error(self, line, index, pos, message):
+        col = pos + 1
+        return LineError(FileType.ARFF, index, col, line, "{} (at char {}), (line:1, col:{})".format(message, pos, col))
 
     def _comment(self):
         return Suppress(Literal("%") + restOfLine)
@@ -0,0 +1,547 @@
+import io
+import os
+import bz2
+import mmap
+import gzip
+import lzma
+import struct
+import codecs
+import hashlib
+import tempfile
+from array import array
+from bisect import bisect_right
+from functools import partial
+from itertools import chain, accumulate
+
+
+# modules which read and write compressed files, names of their compression level argument
+# and minimal levels, keys are suffixes of compressed files
+COMPRESSIONS = {'.gz': (gzip, 'compresslevel', 0),
+                '.bz2': (bz2, 'compresslevel', 1),
+                '.xz': (lzma, 'preset', 0)}
+
+
+def split_compression(path):
+    """Return tuple (path without compression suffix, compression suffix or empty string)"""
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSIONS:
+        return root, ext
+    return path, ''
+
+
+def open_file(path, mode='r', compress_level=None, encoding=None, errors=None):
+    """
+    Open text file, file with compression suffix (see COMPRESSIONS) is decompressed while it is read
+    or compressed while it is written, by compress_level (None -> default level of the compression).
+    """
+    if split_compression(path)[1]:
+        return CompressedFile(path, mode, compress_level, encoding, errors)
+    return open(path, mode, encoding=encoding, errors=errors)
+
+
+class CompressedFile(io.TextIOWrapper):
+    """Text file compressed by one of COMPRESSIONS, opened by open_file"""
+
+    def __init__(self, path, mode='r', compress_level=None, encoding=None, errors=None):
+        module, level_arg, min_level = COMPRESSIONS[split_compression(path)[1].lower()]
+        mode = mode.replace('t', '')
+        kwargs = {}
+        if compress_level is not None and 'r' not in mode:
+            kwargs[level_arg] = max(compress_level, min_level)
+        self._path = path
+        self._raw = open(path, mode + 'b')
+        try:
+            compressed = module.open(self._raw, mode + 'b', **kwargs)
+        except BaseException:
+            self._raw.close()
+            raise
+        super().__init__(compressed, encoding, errors)
+
+    @property
+    def name(self):
+        return self._path
+
+    def compressed_tell(self):
+        """Return position in the compressed file"""
+        return self._raw.tell()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+class MappedSource:
+    """
+    Read only text source backed by memory mapped file.
+    Offsets of lines are remembered, so seek_line can jump to any line
+    without reading and decoding preceding lines again. Offsets found by seek_line
+    can be stored in the index file in a directory given to open_index (see INDEX_SUFFIX)
+    and reused while the source file isn't changed.
+    """
+
+    # offset of every STEP-th line is remembered in seek_line
+    STEP = 1024
+    INDEX_SUFFIX = '.swiftidx'
+    # must be incremented when format of the index file is changed
+    INDEX_VERSION = 2
+    # index file starts by header (magic, version, step, size and modification time of the source file,
+    # count of offsets), arrays of line indexes and offsets follow
+    INDEX_MAGIC = b'SWIFTIDX'
+    INDEX_HEADER = struct.Struct('=8sIIqqq')
+    # size of blocks in which lines are counted
+    BLOCK_SIZE = 1 << 24
+    # size of blocks which are split into lines in seek_line
+    SEEK_BLOCK_SIZE = 1 << 20
+    # count of bytes at the beginning of file in which '\r' (translated newline in text mode) is searched
+    NEWLINE_CHECK_SIZE = 1 << 16
+    # encodings in which every line ends by b'\n' and lines can be decoded independently
+    ENCODINGS = ('ascii', 'utf-8', 'iso8859-1', 'cp1252')
+
+    def __init__(self, source):
+        self._source = source
+        self._encoding = source.encoding
+        self._errors = source.errors
+        self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        self._size = len(self._map)
+        # only the beginning of file is checked, so opening doesn't read whole file,
+        # '\r' at the end of other lines is removed when lines are stripped
+        first_end = self._map.find(b'\n', 0, self.NEWLINE_CHECK_SIZE)
+        if self._map.find(b'\r', 0, first_end if first_end >= 0 else self.NEWLINE_CHECK_SIZE) >= 0:
+            self._map.close()
+            raise ValueError("Newlines would be translated in text mode.")
+        # sorted indexes of lines with known offset and the offsets
+        self._known_lines = [0]
+        self._known_offsets = [0]
+        # path of the index file (see open_index)
+        self._index_path = None
+        # offsets were found by seek_line, index file should be written
+        self._index_changed = False
+
+    @classmethod
+    def can_map(cls, source):
+        """Return True if the source is a text file which can be memory mapped"""
+        try:
+            return (isinstance(source, io.TextIOWrapper) and
+                    isinstance(source.buffer.raw, io.FileIO) and
+                    source.readable() and not source.writable() and
+                    source.seekable() and source.tell() == 0 and
+                    codecs.lookup(source.encoding).name in cls.ENCODINGS)
+        except (AttributeError, OSError, LookupError, ValueError):
+            return False
+
+    @property
+    def name(self):
+        return self._source.name
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    @property
+    def size(self):
+        """size of the file in bytes"""
+        return self._size
+
+    @property
+    def closed(self):
+        return self._map.closed
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        return self._source.fileno()
+
+    def __iter__(self):
+        # lines are read by C iterators, much faster than calling __next__ for every line
+        return map(partial(bytes.decode, encoding=self._encoding, errors=self._errors),
+                   iter(self._map.readline, b''))
+
+    def __next__(self):
+        line = self._map.readline()
+        if not line:
+            raise StopIteration
+        return line.decode(self._encoding, self._errors)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def readline(self):
+        return self._map.readline().decode(self._encoding, self._errors)
+
+    def read(self):
+        return self._map.read().decode(self._encoding, self._errors)
+
+    def tell(self):
+        return self._map.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def mark_line(self, index):
+        """Remember that line with the index starts at current position"""
+        self._add_offset(index, self._map.tell())
+
+    def _add_offset(self, index, offset):
+        """Remember offset of line with the index, return False if it is already known"""
+        i = bisect_right(self._known_lines, index)
+        if self._known_lines[i-1] == index:
+            return False
+        self._known_lines.insert(i, index)
+        self._known_offsets.insert(i, offset)
+        return True
+
+    def seek_line(self, index):
+        """Move to the beginning of line with the index (counted from the beginning of file)"""
+        i = bisect_right(self._known_lines, index) - 1
+        line = self._known_lines[i]
+        pos = self._known_offsets[i]
+        while line < index and pos < self._size:
+            # lines of the block are split at once, the last part of block isn't a whole line,
+            # i-th line ends at sum of lengths of lines 0..i plus i + 1 newlines
+            lengths = list(accumulate(map(len, self._map[pos:pos + self.SEEK_BLOCK_SIZE].split(b'\n'))))
+            lengths.pop()
+            if not lengths:  # line is longer than the block
+                lengths = [(self._map.find(b'\n', pos) + 1 or self._size) - pos - 1]
+            count = min(len(lengths), index - line)
+            for step_line in range(line + self.STEP - line % self.STEP, line + count + 1, self.STEP):
+                if self._add_offset(step_line, pos + lengths[step_line - line - 1] + step_line - line):
+                    self._index_changed = True
+            pos += lengths[count - 1] + count
+            line += count
+        self._map.seek(pos)
+
+    def get_line_index(self):
+        """Return index of line which starts at current position"""
+        pos = self._map.tell()
+        i = bisect_right(self._known_offsets, pos) - 1
+        line = self._known_lines[i]
+        start = self._known_offsets[i]
+        while start < pos:
+            end = min(start + self.BLOCK_SIZE, pos)
+            line += self._map[start:end].count(b'\n')
+            start = end
+        return line
+
+    def skip_lines(self, count):
+        """Move forward by count lines"""
+        self.seek_line(self.get_line_index() + count)
+
+    def open_index(self, directory):
+        """
+        Load offsets from the index file of the source file in the directory (e.g. cache directory),
+        offsets found later are stored to the index file when the source is closed.
+        """
+        name = hashlib.sha1(os.path.abspath(self.name).encode()).hexdigest() + self.INDEX_SUFFIX
+        self._index_path = os.path.join(directory, name)
+        self._load_index()
+
+    def _get_fingerprint(self):
+        stat = os.stat(self.name)
+        return self.INDEX_MAGIC, self.INDEX_VERSION, self.STEP, stat.st_size, stat.st_mtime_ns
+
+    def _load_index(self):
+        """Load offsets from the index file, if it belongs to the current source file"""
+        lines = array('q')
+        offsets = array('q')
+        try:
+            with open(self._index_path, 'rb') as f:
+                *fingerprint, count = self.INDEX_HEADER.unpack(f.read(self.INDEX_HEADER.size))
+                if tuple(fingerprint) != self._get_fingerprint():
+                    return
+                lines.fromfile(f, count)
+                offsets.fromfile(f, count)
+        except (OSError, EOFError, ValueError, struct.error):  # missing or damaged index is same as no index
+            return
+        for index, offset in zip(lines, offsets):
+            if index > 0 and 0 <= offset <= self._size:
+                self._add_offset(index, offset)
+
+    def _save_index(self):
+        """Store offsets to the index file, errors are ignored because index is only optional"""
+        if not self._index_path or not self._index_changed:
+            return
+        directory = os.path.dirname(self._index_path)
+        temp_name = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+                temp_name = f.name
+                f.write(self.INDEX_HEADER.pack(*self._get_fingerprint(), len(self._known_lines)))
+                array('q', self._known_lines).tofile(f)
+                array('q', self._known_offsets).tofile(f)
+            os.replace(temp_name, self._index_path)
+            self._index_changed = False
+        except OSError:
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+
+    def get_chunks(self, start, count):
+        """
+        Split the file from start offset to the end into at most count parts on lines boundaries.
+        Return list of tuples (offset, line count).
+        """
+        chunks = []
+        chunk_size = max(1, (self._size - start) // count)
+        while start < self._size:
+            end = self._map.find(b'\n', start + chunk_size - 1) + 1 or self._size
+            lines = self._map[start:end].count(b'\n')
+            if end == self._size and self._map[end-1:end] != b'\n':
+                lines += 1  # last line without newline
+            chunks.append((start, lines))
+            start = end
+        return chunks
+
+    def close(self):
+        if not self._map.closed:
+            self._save_index()
+            self._map.close()
+        self._source.close()
+
+
+def map_source(source):
+    """Return MappedSource if the source can be memory mapped, otherwise the source itself."""
+    if not MappedSource.can_map(source):
+        return source
+    try:
+        return MappedSource(source)
+    except (OSError, ValueError):  # empty file or file with '\r'
+        return source
+
+
+class BufferedTarget:
+    """
+    Text target which collects written strings and writes them at once
+    when count of collected characters reaches buffer_size.
+    If binary is True, collected strings are encoded at once and written directly to the binary buffer
+    under the text target (only if newlines aren't translated).
+    """
+
+    def __init__(self, target, buffer_size, binary=False):
+        self._target = target
+        self._buffer = []
+        self._buffered = 0
+        self._buffer_size = buffer_size
+        self._binary = binary and self.can_write_binary(target)
+        if self._binary:
+            target.flush()
+
+    @staticmethod
+    def can_write_binary(target):
+        return isinstance(target, io.TextIOWrapper) and os.linesep == '\n'
+
+    @property
+    def name(self):
+        return self._target.name
+
+    @property
+    def encoding(self):
+        return self._target.encoding
+
+    @property
+    def closed(self):
+        return self._target.closed
+
+    def seekable(self):
+        return False
+
+    def fileno(self):
+        return self._target.fileno()
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._buffer_size:
+            self._write_buffer()
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        text = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if self._binary:
+            self._target.buffer.write(text.encode(self._target.encoding, self._target.errors))
+        else:
+            self._target.write(text)
+
+    def flush(self):
+        if not self._target.closed:
+            self._write_buffer()
+            self._target.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.flush()
+        self._target.close()
+
+
+class PushbackSource:
+    """Not seekable text source, lines which were already read from the source are returned again first"""
+
+    def __init__(self, source, lines):
+        self._source = source
+        self._lines = chain(lines, source)
+
+    @property
+    def name(self):
+        return self._source.name
+
+    @property
+    def encoding(self):
+        return self._source.encoding
+
+    @property
+    def closed(self):
+        return self._source.closed
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def seekable(self):
+        return False
+
+    def __iter__(self):
+        return self._lines
+
+    def __next__(self):
+        return next(self._lines)
+
+    def readline(self):
+        return next(self._lines, '')
+
+    def close(self):
+        self._source.close()
+
+
+class Spool:
+    """
+    Temporary storage of data which are read again later (lines of not seekable source,
+    lines prepared in single pass mode). Data are written first, then rewind switches
+    the spool to reading from the beginning.
+    Data are kept in memory until their size exceeds max_memory bytes (0 -> they are written
+    to the file directly), the temporary file is created in the directory (None -> default temporary directory).
+    If compress is True, data are compressed by gzip. Text spool is read and written as text,
+    otherwise as bytes (e.g. by marshal).
+    """
+
+    COMPRESS_LEVEL = 1
+    # any string can be stored, also lone surrogates from sources decoded with surrogateescape
+    ENCODING = 'utf-8'
+    ERRORS = 'surrogatepass'
+
+    def __init__(self, directory=None, max_memory=0, compress=False, text=False, name=None):
+        if max_memory > 0:
+            self._file = tempfile.SpooledTemporaryFile(max_memory, 'w+b', dir=directory)
+        else:
+            self._file = tempfile.TemporaryFile('w+b', dir=directory)
+        self._compress = compress
+        self._text = text
+        self._name = name
+        self._stream = self._open('wb')
+
+    def _open(self, mode):
+        stream = self._file
+        if self._compress:
+            stream = gzip.GzipFile(fileobj=stream, mode=mode, compresslevel=self.COMPRESS_LEVEL)
+        if self._text:
+            stream = io.TextIOWrapper(stream, self.ENCODING, self.ERRORS, newline='')
+        return stream
+
+    @property
+    def name(self):
+        """name of the spooled source"""
+        return self._name
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def record(self, lines):
+        """Generator of the lines, every line is also written to the spool"""
+        write = self._stream.write
+        for line in lines:
+            write(line)
+            yield line
+
+    def rewind(self):
+        """Finish writing, data are read from the beginning, return self"""
+        stream = self._stream
+        if self._text:
+            stream.flush()
+            stream = stream.detach()
+        if self._compress:
+            stream.close()  # only writes the end of gzip stream, the file stays opened
+        self._file.seek(0)
+        self._stream = self._open('rb')
+        return self
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __next__(self):
+        return next(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+    def readline(self):
+        return self._stream.readline()
+
+    def tell(self):
+        return self._stream.tell()
+
+    def file_tell(self):
+        """Position in the temporary file (compressed size is counted), known also while text lines are iterated"""
+        return self._file.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._stream.seek(offset, whence)
+
+    def close(self):
+        if not self._file.closed:
+            self._stream.close()  # compressed stream doesn't close the file
+            self._file.close()